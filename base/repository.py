@@ -1,12 +1,40 @@
+import io
 import logging
-from fastapi import Query
-from sqlalchemy import Column, desc, asc
-from typing import Optional, Dict, Any, List, Type, TypeVar, Generic, Union
-from sqlalchemy.orm import DeclarativeBase
-from base.schemas.request import SortBy
-from db import get_db
-from base.utils.short_id import generate_primary_key
-from sqlalchemy import asc, desc
+from collections import defaultdict
+from sqlalchemy import (
+    desc,
+    asc,
+    insert,
+    update,
+    delete,
+    and_,
+    or_,
+    tuple_,
+    select,
+)
+from typing import (
+    Optional,
+    Dict,
+    Any,
+    List,
+    Type,
+    TypeVar,
+    Union,
+    Tuple,
+    Callable,
+    Iterator,
+    AsyncIterator,
+)
+from sqlalchemy.orm import DeclarativeBase, Query
+from sqlalchemy.util import await_only
+from base.utils.short_id import generate_primary_key, generate_primary_keys
+from base.utils.cursor import encode_cursor, decode_cursor
+from base.utils.cache import CacheBackend
+from base.utils.explain import estimate_rows, explain_statement
+from base.utils.filters import compile_filters, filter_shape, filter_values
+from base.utils.read_routing import reads_pinned_to_primary, replica_reads
+from base.utils.search import SearchIndex
+from base.utils.serializer import model_serializer, row_serializer
 
 
 logger = logging.getLogger(__name__)
@@ -14,55 +42,492 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T", bound=DeclarativeBase)
 
 
+def _csv_field(value: Any) -> str:
+    # COPY ... CSV only reads an unquoted empty field as NULL, so quoting every
+    # value keeps any text (including "" or \N) from being taken for one
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
 class BaseRepository:
+    # Shared read-through cache for get_by_id; subclasses set one per model.
+    cache: Optional[CacheBackend] = None
+    # Short-lived cache of exact list counts per filter; cleared on every write.
+    count_cache: Optional[CacheBackend] = None
+    # Text search for list(search=...); None where the model has no search index.
+    search_index: Optional[SearchIndex] = None
+
     def __init__(self, db):
         self.db = db
 
+    @staticmethod
+    def _cache_key(model: Type[T], record_id: str) -> str:
+        return f"{model.__tablename__}:{record_id}"
+
+    @classmethod
+    def _cache_get(cls, model: Type[T], record_id: str) -> Optional[Dict[str, Any]]:
+        # Inside a read-your-writes window the cache may hold a replica's stale copy
+        if cls.cache is None or reads_pinned_to_primary():
+            return None
+        cached = cls.cache.get(cls._cache_key(model, record_id))
+        return dict(cached) if cached is not None else None
+
+    @classmethod
+    def _cache_invalidate(cls, model: Type[T], record_id: str) -> None:
+        if cls.cache is not None:
+            cls.cache.delete(cls._cache_key(model, record_id))
+
+    @classmethod
+    def _count_cache_key(cls, model: Type[T], filters, search=None) -> str:
+        key = model.__tablename__
+        if filters:
+            key = f"{key}:{filter_shape(filters)}:{filter_values(filters)}"
+        return f"{key}:search={search}" if search else key
+
+    def _commit(self) -> None:
+        self.db.commit()
+        if self.count_cache is not None:
+            self.count_cache.clear()
+
     @staticmethod
     def _generate_id(prefix: str = "Exp") -> str:
         return generate_primary_key(prefix)
 
+    @staticmethod
+    def _generate_ids(count: int, prefix: str = "Exp") -> List[str]:
+        return generate_primary_keys(count, prefix)
+
     def create(self, model_instances: List[T]) -> List[str]:
         if not isinstance(model_instances, list):
             raise ValueError("model_instances must be a list, even for single records")
         created_expenses = []
-        for model_instance in model_instances:
-            model_instance.id = self._generate_id()
+        ids = self._generate_ids(len(model_instances))
+        for model_instance, model_id in zip(model_instances, ids):
+            model_instance.id = model_id
             self.db.add(model_instance)
             created_expenses.append(model_instance.id)
-        self.db.commit()
+        self._commit()
         return created_expenses
 
+    def bulk_create(
+        self,
+        model: Type[T],
+        rows: List[Dict[str, Any]],
+        chunk_size: int = 1000,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Insert many rows in chunked multi-row statements inside one transaction
+        (COPY on PostgreSQL, through psycopg2 or, on the async path, asyncpg).
+
+        Each chunk runs in a savepoint. If a chunk fails, its rows are retried one
+        by one so that only the offending rows are reported in ``errors`` and the
+        rest of the batch is still committed. Indexes refer to positions in ``rows``.
+        """
+        table = model.__table__
+        created = []
+        errors = []
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = []
+            chunk_rows = rows[start : start + chunk_size]
+            ids = self._generate_ids(len(chunk_rows))
+            for index, row, row_id in zip(range(start, len(rows)), chunk_rows, ids):
+                values = self._prepare_row(table, row)
+                values["id"] = row_id
+                chunk.append((index, values))
+
+            try:
+                with self.db.begin_nested():
+                    self._insert_rows(table, [values for _, values in chunk])
+            except Exception as e:
+                logger.warning(
+                    f"Bulk insert chunk at {start} failed, retrying row by row: {str(e)}"
+                )
+                chunk = self._insert_rows_individually(table, chunk, errors)
+
+            created.extend(
+                {"index": index, "id": values["id"]} for index, values in chunk
+            )
+
+        self._commit()
+        return {"created": created, "errors": errors}
+
+    def _insert_rows_individually(self, table, chunk, errors: List[Dict[str, Any]]):
+        inserted = []
+        for index, values in chunk:
+            try:
+                with self.db.begin_nested():
+                    self._insert_rows(table, [values])
+                inserted.append((index, values))
+            except Exception as e:
+                errors.append({"index": index, "error": str(e)})
+        return inserted
+
+    def _insert_rows(self, table, rows: List[Dict[str, Any]]) -> None:
+        connection = self.db.connection()
+        dialect = connection.dialect
+        if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+            self._copy_rows(connection, table, rows)
+        elif dialect.name == "postgresql" and dialect.driver == "asyncpg":
+            self._copy_records(connection, table, rows)
+        else:
+            connection.execute(insert(table), rows)
+
+    def _copy_rows(self, connection, table, rows: List[Dict[str, Any]]) -> None:
+        quote = connection.dialect.identifier_preparer.quote
+        column_names = list(rows[0].keys())
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_csv_field(row[name]) for name in column_names))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        copy_sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+            quote(table.name), ", ".join(quote(name) for name in column_names)
+        )
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(copy_sql, buffer)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _copy_records(connection, table, rows: List[Dict[str, Any]]) -> None:
+        # asyncpg's binary COPY. The async repository runs this inside
+        # AsyncSession.run_sync, whose greenlet lets await_only wait on it.
+        column_names = list(rows[0].keys())
+        await_only(
+            connection.connection.driver_connection.copy_records_to_table(
+                table.name,
+                records=[tuple(row[name] for name in column_names) for row in rows],
+                columns=column_names,
+                schema_name=table.schema,
+            )
+        )
+
+    @staticmethod
+    def _prepare_row(table, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill every column so all rows share one shape (required by executemany and COPY)."""
+        values = {}
+        for column in table.columns:
+            if column.key in row:
+                values[column.key] = row[column.key]
+            elif column.default is not None and column.default.is_callable:
+                values[column.key] = column.default.arg(None)
+            elif column.default is not None and column.default.is_scalar:
+                values[column.key] = column.default.arg
+            elif column.server_default is None:
+                values[column.key] = None
+        return values
+
     def get_by_id(self, model: Type[T], record_id: str) -> Optional[Dict[str, Any]]:
-        record = self.db.get(model, record_id)
+        cached = self._cache_get(model, record_id)
+        if cached is not None:
+            return cached
+        return self._load_by_id(model, record_id)
+
+    def _load_by_id(self, model: Type[T], record_id: str) -> Optional[Dict[str, Any]]:
+        """Reads the record from the database and populates the cache."""
+        token = self.cache.fill_token() if self.cache is not None else None
+        with replica_reads(self.db) as reads:
+            record = self.db.get(model, record_id)
         if record:
-            return self._model_to_dict(record)
+            data = self._model_to_dict(record)
+            # A replica's row may predate a write the cache was invalidated for,
+            # and would then outlive the replication lag by the whole TTL
+            if self.cache is not None and not reads.used:
+                self.cache.set(
+                    self._cache_key(model, record_id), dict(data), token=token
+                )
+            return data
         return None
 
-    def update_by_id(self, model: Type[T], record_id: str, fields_to_update: T) -> str:
+    def get_version(self, model: Type[T], record_id: str):
+        """``modified_at`` of the record, None if it doesn't exist."""
+        cached = self._cache_get(model, record_id)
+        if cached is not None:
+            return cached["modified_at"]
+        return self._load_version(model, record_id)
+
+    def _load_version(self, model: Type[T], record_id: str):
+        # Covered by an (id, modified_at) index: the row itself isn't read
+        with replica_reads(self.db):
+            return self.db.execute(
+                select(model.modified_at).where(model.id == record_id)
+            ).scalar_one_or_none()
+
+    def update_by_id(
+        self,
+        model: Type[T],
+        record_id: str,
+        fields_to_update: Union[T, Dict[str, Any]],
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Applies ``fields_to_update`` with a single ``UPDATE ... RETURNING``.
+        Only the keys present are written: a key set to None clears the
+        column, a missing key leaves it untouched.
+
+        :param snapshot_columns: columns read (and locked) before the update
+            and passed, with the id, to ``on_batch`` in the same transaction
+        """
+        condition = model.id == record_id
+        values = self._update_values(model, fields_to_update)
+        snapshot = (
+            self._snapshot(model, condition, snapshot_columns)
+            if snapshot_columns
+            else None
+        )
+        rows = self._update_returning(model, condition, values)
+        if not rows:
+            self.db.rollback()
+            raise ValueError(f"Record with ID {record_id} not found for update.")
+
+        if snapshot:
+            on_batch(snapshot)
+        self._commit()
+        self._cache_invalidate(model, record_id)
+        return {"id": rows[0].id, "modified_at": rows[0].modified_at}
+
+    def bulk_update(
+        self,
+        model: Type[T],
+        changes: List[Tuple[str, Dict[str, Any]]],
+        batch_size: int = 1000,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Applies per-record ``(id, values)`` changes in one transaction. Records
+        receiving identical values share one ``UPDATE ... WHERE id IN (...)``
+        per batch of ``batch_size`` ids.
+
+        :param snapshot_columns: columns read (and locked) before each batch is
+            updated and passed, with the id, to ``on_batch`` before the commit
+        :return: dict with the ``updated`` count and the ``not_found`` ids
+        """
+        groups = defaultdict(list)
+        for record_id, values in changes:
+            groups[tuple(sorted(values.items()))].append(record_id)
+
+        found = set()
+        snapshots = []
+        for values, ids in groups.items():
+            for start in range(0, len(ids), batch_size):
+                condition = model.id.in_(ids[start : start + batch_size])
+                if snapshot_columns:
+                    snapshots.append(self._snapshot(model, condition, snapshot_columns))
+                rows = self._update_returning(model, condition, dict(values))
+                found.update(row.id for row in rows)
+
+        for snapshot in snapshots:
+            on_batch(snapshot)
+        self._commit()
+        for record_id in found:
+            self._cache_invalidate(model, record_id)
+        not_found = [record_id for record_id, _ in changes if record_id not in found]
+        return {"updated": len(found), "not_found": not_found}
+
+    def bulk_update_by_filters(
+        self,
+        model: Type[T],
+        filters: Dict[str, Dict[str, Any]],
+        values: Dict[str, Any],
+        batch_size: int = 1000,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Applies ``values`` to every record matching ``filters``.
+
+        Matching records are walked in id order, ``batch_size`` at a time, with
+        one UPDATE per batch, each committed on its own so row locks are held
+        briefly. Walking by id also ends the loop when the update leaves rows
+        matching the filters. ``on_batch`` gets each batch's snapshot inside
+        the batch's transaction, so what it writes commits with the batch.
+        """
+        columns = [model.id] + [getattr(model, name) for name in snapshot_columns or []]
+        updated = 0
+        last_id = None
+        while True:
+            query = self._apply_filters(self.db.query(*columns), filters, model)
+            if last_id is not None:
+                query = query.filter(model.id > last_id)
+            rows = query.order_by(model.id).limit(batch_size).with_for_update().all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            self._update_returning(model, model.id.in_(ids), values)
+            if snapshot_columns:
+                on_batch([dict(row._mapping) for row in rows])
+            self._commit()
+            for record_id in ids:
+                self._cache_invalidate(model, record_id)
+            updated += len(ids)
+            last_id = ids[-1]
+        return {"updated": updated, "not_found": []}
+
+    def bulk_delete(
+        self,
+        model: Type[T],
+        ids: List[str],
+        batch_size: int = 1000,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Deletes ``ids`` with one ``DELETE ... WHERE id IN (...)`` per batch of
+        ``batch_size``, committing each batch.
+
+        :param snapshot_columns: columns of the deleted rows passed, with the
+            id, to ``on_batch`` before the batch commits (taken from
+            RETURNING where supported)
+        :return: dict with the ``deleted`` count and the ``not_found`` ids
+        """
+        found = set()
+        for start in range(0, len(ids), batch_size):
+            rows = self._delete_returning(
+                model, model.id.in_(ids[start : start + batch_size]), snapshot_columns
+            )
+            self._commit_delete_batch(model, rows, snapshot_columns, on_batch)
+            found.update(row.id for row in rows)
+        not_found = [record_id for record_id in ids if record_id not in found]
+        return {"deleted": len(found), "not_found": not_found}
+
+    def bulk_delete_by_filters(
+        self,
+        model: Type[T],
+        filters: Dict[str, Dict[str, Any]],
+        batch_size: int = 1000,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Deletes every record matching ``filters``, ``batch_size`` rows per
+        statement (``DELETE ... WHERE id IN (SELECT id ... LIMIT n)``), each
+        batch committed on its own so a large purge never holds locks on, or
+        writes WAL for, more than one batch at a time.
+        """
+        deleted = 0
+        while True:
+            batch = (
+                self._apply_filters(self.db.query(model.id), filters, model)
+                .order_by(model.id)
+                .limit(batch_size)
+            )
+            rows = self._delete_returning(
+                model, model.id.in_(batch.scalar_subquery()), snapshot_columns
+            )
+            self._commit_delete_batch(model, rows, snapshot_columns, on_batch)
+            if not rows:
+                break
+            deleted += len(rows)
+        return {"deleted": deleted, "not_found": []}
+
+    def count_matching(
+        self,
+        model: Type[T],
+        filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """Number of records matching ``filters`` or existing among ``ids``."""
+        if ids is not None:
+            return sum(
+                self.db.query(model.id)
+                .filter(model.id.in_(ids[start : start + batch_size]))
+                .count()
+                for start in range(0, len(ids), batch_size)
+            )
+        return self._apply_filters(
+            self.db.query(model.id), filters or {}, model
+        ).count()
+
+    @staticmethod
+    def _update_values(
+        model: Type[T], fields_to_update: Union[T, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if isinstance(fields_to_update, dict):
+            return dict(fields_to_update)
         if not isinstance(fields_to_update, model):
             raise ValueError(
-                f"fields_to_update must be an instance of {model.__name__}"
+                f"fields_to_update must be a dict or an instance of {model.__name__}"
             )
+        return {
+            key: value
+            for key, value in fields_to_update.__dict__.items()
+            if not key.startswith("_")
+        }
 
-        record = self.db.get(model, record_id)
-        if not record:
-            raise ValueError(f"Record with ID {record_id} not found for update.")
+    def _update_returning(self, model: Type[T], condition, values: Dict[str, Any]):
+        """Updates the rows matching ``condition``; returns their (id, modified_at)."""
+        statement = (
+            update(model)
+            .where(condition)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if self.db.get_bind().dialect.update_returning:
+            return self.db.execute(
+                statement.returning(model.id, model.modified_at)
+            ).all()
+        # Dialects without RETURNING need a second round trip
+        self.db.execute(statement)
+        return self.db.execute(
+            select(model.id, model.modified_at).where(condition)
+        ).all()
 
-        for key, value in fields_to_update.__dict__.items():
-            if not key.startswith("_"):
-                setattr(record, key, value)
+    def _snapshot(
+        self, model: Type[T], condition, column_names: List[str]
+    ) -> List[Dict[str, Any]]:
+        columns = [model.id] + [getattr(model, name) for name in column_names]
+        rows = self.db.execute(
+            select(*columns).where(condition).with_for_update()
+        ).all()
+        return [dict(row._mapping) for row in rows]
 
-        self.db.commit()
-        return {"id": record.id, "modified_at": record.modified_at}
+    def _delete_returning(
+        self, model: Type[T], condition, column_names: Optional[List[str]]
+    ) -> List:
+        """Deletes the rows matching ``condition``; returns their id and ``column_names``."""
+        columns = [model.id] + [getattr(model, name) for name in column_names or []]
+        statement = (
+            delete(model).where(condition).execution_options(synchronize_session=False)
+        )
+        if self.db.get_bind().dialect.delete_returning:
+            return self.db.execute(statement.returning(*columns)).all()
+        # Dialects without RETURNING read the batch first
+        rows = self.db.execute(
+            select(*columns).where(condition).with_for_update()
+        ).all()
+        self.db.execute(statement)
+        return rows
 
-    def delete_by_id(self, model: Type[T], record_id: str) -> int:
-        record = self.db.get(model, record_id)
-        if record:
-            self.db.delete(record)
-            self.db.commit()
-            return 1
-        return 0
+    def _commit_delete_batch(self, model, rows, snapshot_columns, on_batch) -> None:
+        if snapshot_columns and rows:
+            on_batch([dict(row._mapping) for row in rows])
+        self._commit()
+        for row in rows:
+            self._cache_invalidate(model, row.id)
+
+    def delete_by_id(
+        self,
+        model: Type[T],
+        record_id: str,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> int:
+        """
+        Deletes one record; returns the number of rows deleted (0 or 1).
+
+        :param snapshot_columns: columns of the deleted row passed, with the
+            id, to ``on_batch`` before the delete commits
+        """
+        rows = self._delete_returning(model, model.id == record_id, snapshot_columns)
+        self._commit_delete_batch(model, rows, snapshot_columns, on_batch)
+        return len(rows)
 
     def list(
         self,
@@ -73,27 +538,293 @@ class BaseRepository:
         sort_by: Optional[List[Dict[str, Any]]] = None,
         skip: int = 0,
         limit: int = 100,
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        count: str = "exact",
+        search: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        ``count`` picks what ``total_count`` holds: ``exact`` (cached briefly per
+        filter), ``estimated`` (exact where no estimate is available), or nothing
+        for ``none`` and ``has_more``; ``count_kind`` reports which one it is.
+
+        ``search`` restricts the rows to text search matches (see
+        ``search_index``). Offset pages list the best matches first, then follow
+        ``sort_by``; cursor pages follow the sort keys only.
+        """
+        with replica_reads(self.db):
+            if keyset:
+                return self._list_keyset(
+                    model=model,
+                    columns=columns,
+                    filters=filters,
+                    sort_by=sort_by,
+                    limit=limit,
+                    cursor=cursor,
+                    count=count,
+                    search=search,
+                )
+            return self._list_offset(
+                model, columns, filters, sort_by, skip, limit, count, search
+            )
+
+    def _list_offset(
+        self,
+        model,
+        columns,
+        filters,
+        sort_by,
+        skip: int,
+        limit: int,
+        count: str,
+        search: Optional[str] = None,
     ) -> Dict[str, Any]:
+        query = self._list_query(model, columns, filters)
+        query, rank = self._apply_search(query, search)
+
+        total_count, count_kind = self._count(model, query, filters, count, search)
+
+        if rank is not None:
+            query = query.order_by(rank)
+        if sort_by:
+            query = self._apply_sorting(query, sort_by, model)
+
+        if count == "has_more":
+            query_data = query.offset(skip).limit(limit + 1).all()
+            has_more = len(query_data) > limit
+            query_data = query_data[:limit]
+        else:
+            query_data = query.offset(skip).limit(limit).all()
+            has_more = None
+
+        data = self._rows_to_dicts(query_data, columns)
+
+        logger.debug("List query: %s", query)
+        return {
+            "data": data,
+            "total_count": total_count,
+            "count_kind": count_kind,
+            "has_more": has_more,
+        }
+
+    def _count(
+        self, model, query, filters, count: str, search: Optional[str] = None
+    ) -> Tuple[Optional[int], str]:
+        if count == "estimated":
+            estimate = self._estimate_count(model, query, filters, search)
+            if estimate is not None:
+                return estimate, "estimated"
+            count = "exact"
+        if count != "exact":
+            return None, count
 
+        key = self._count_cache_key(model, filters, search)
+        if self.count_cache is not None and not reads_pinned_to_primary():
+            cached = self.count_cache.get(key)
+            if cached is not None:
+                return cached, "exact"
+        total_count = query.count()
+        if self.count_cache is not None:
+            self.count_cache.set(key, total_count)
+        return total_count, "exact"
+
+    def _estimate_count(
+        self, model, query, filters, search: Optional[str] = None
+    ) -> Optional[int]:
+        """Row estimate of the planner; None where the database has none."""
+        return estimate_rows(self.db, query.statement)
+
+    def _list_keyset(
+        self,
+        *,
+        model,
+        columns: Optional[List],
+        filters: Optional[Dict[str, Dict[str, Any]]],
+        sort_by: Optional[List[Dict[str, Any]]],
+        limit: int,
+        cursor: Optional[str],
+        count: str = "exact",
+        search: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Seek pagination: rows after the cursor are selected with a WHERE clause on
+        the sort keys (plus ``id`` as a tiebreaker) instead of OFFSET, so deep pages
+        cost the same as the first one.
+        """
+        sort_keys = self._keyset_sort_keys(sort_by, model)
+        key_columns = [getattr(model, field) for field, _ in sort_keys]
+
+        query = self._keyset_base_query(model, columns, filters, key_columns)
+        # Matches only: a rank isn't a stable key to continue a cursor from
+        query, _ = self._apply_search(query, search)
+
+        total_count, count_kind = self._count(model, query, filters, count, search)
+
+        query = self._keyset_page_query(query, model, sort_keys, key_columns, cursor)
+
+        # One extra row tells us whether another page exists.
+        query_data = query.limit(limit + 1).all()
+        has_more = len(query_data) > limit
+        query_data = query_data[:limit]
+
+        next_cursor = None
+        if has_more and query_data:
+            last = query_data[-1]
+            if columns:
+                last_values = [last._mapping[column.name] for column in key_columns]
+            else:
+                last_values = [getattr(last, field) for field, _ in sort_keys]
+            next_cursor = encode_cursor(sort_keys, last_values)
+
+        data = self._rows_to_dicts(query_data, columns)
+
+        return {
+            "data": data,
+            "total_count": total_count,
+            "count_kind": count_kind,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }
+
+    def explain_list(
+        self,
+        *,
+        model,
+        columns: Optional[List] = None,
+        filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        sort_by: Optional[List[Dict[str, Any]]] = None,
+        skip: int = 0,
+        limit: int = 100,
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """EXPLAINs the page query ``list`` would run for the same arguments."""
+        if keyset:
+            sort_keys = self._keyset_sort_keys(sort_by, model)
+            key_columns = [getattr(model, field) for field, _ in sort_keys]
+            query = self._keyset_base_query(model, columns, filters, key_columns)
+            query, _ = self._apply_search(query, search)
+            query = self._keyset_page_query(
+                query, model, sort_keys, key_columns, cursor
+            ).limit(limit + 1)
+        else:
+            query = self._list_query(model, columns, filters)
+            query, rank = self._apply_search(query, search)
+            if rank is not None:
+                query = query.order_by(rank)
+            if sort_by:
+                query = self._apply_sorting(query, sort_by, model)
+            query = query.offset(skip).limit(limit)
+        return explain_statement(self.db, query.statement)
+
+    def _list_query(self, model, columns: Optional[List], filters) -> Query:
         query = self.db.query(*(columns if columns else [model]))
+        if filters:
+            query = self._apply_filters(query, filters, model)
+        return query
 
+    def _apply_search(self, query: Query, search: Optional[str]) -> Tuple[Query, Any]:
+        """:return: the query restricted to ``search`` matches and the ranking
+        ORDER BY clause (None without a search)"""
+        if not search:
+            return query, None
+        if self.search_index is None:
+            raise ValueError("Search is not supported for this resource")
+        return self.search_index.apply(query, search, self.db.get_bind().dialect.name)
+
+    def _keyset_base_query(
+        self, model, columns: Optional[List], filters, key_columns
+    ) -> Query:
+        selected = list(columns) if columns else [model]
+        if columns:
+            # Key columns are appended after the requested ones so the cursor can
+            # be built; _row_to_dict only reads the requested positions.
+            selected_names = {column.name for column in columns}
+            selected += [c for c in key_columns if c.name not in selected_names]
+        query = self.db.query(*selected)
         if filters:
             query = self._apply_filters(query, filters, model)
+        return query
 
-        total_count = query.count()
+    def _keyset_page_query(
+        self, query: Query, model, sort_keys, key_columns, cursor: Optional[str]
+    ) -> Query:
+        if cursor:
+            values = decode_cursor(cursor, sort_keys, model)
+            query = query.filter(self._keyset_condition(sort_keys, key_columns, values))
 
-        if sort_by:
-            query = self._apply_sorting(query, sort_by, model)
+        return query.order_by(
+            *(
+                desc(column) if order == "desc" else asc(column)
+                for (_, order), column in zip(sort_keys, key_columns)
+            )
+        )
 
-        query_data = query.offset(skip).limit(limit).all()
+    @staticmethod
+    def _keyset_sort_keys(sort_by, model) -> List[tuple]:
+        sort_keys = [
+            (spec["field"], spec["order"])
+            for spec in sort_by or []
+            if hasattr(model, spec["field"]) and spec["field"] != "id"
+        ]
+        tiebreak_order = sort_keys[-1][1] if sort_keys else "asc"
+        sort_keys.append(("id", tiebreak_order))
+        return sort_keys
 
+    @staticmethod
+    def _keyset_condition(sort_keys, key_columns, values):
+        orders = {order for _, order in sort_keys}
+        if len(orders) == 1:
+            # Uniform direction: a row-value comparison that an index on the
+            # sort keys can satisfy directly.
+            left, right = tuple_(*key_columns), tuple_(*values)
+            return left < right if orders == {"desc"} else left > right
+
+        # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+        clauses = []
+        for position, ((_, order), column) in enumerate(zip(sort_keys, key_columns)):
+            value = values[position]
+            step = column < value if order == "desc" else column > value
+            equal_prefix = [key_columns[i] == values[i] for i in range(position)]
+            clauses.append(and_(*equal_prefix, step))
+        return or_(*clauses)
+
+    def stream(
+        self,
+        *,
+        model,
+        filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        sort_by: Optional[List[Dict[str, Any]]] = None,
+        batch_size: int = 1000,
+        columns: Optional[List] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every matching row as a dict, reading through a server-side cursor
+        ``batch_size`` rows at a time so memory stays flat regardless of how many
+        rows match.
+        """
+        statement = self._build_stream_select(
+            model, filters, sort_by, batch_size, columns
+        )
+        result = self.db.execute(statement)
         if columns:
-            data = [self._row_to_dict(row, columns) for row in query_data]
+            serialize = row_serializer(columns)
         else:
-            data = [self._model_to_dict(row) for row in query_data]
+            serialize = model_serializer(model)
+            result = result.scalars()
+        for record in result:
+            yield serialize(record)
 
-        print("Final query before execution:", query)
-        return {"data": data, "total_count": total_count}
+    def _build_stream_select(
+        self, model, filters, sort_by, batch_size: int, columns: Optional[List] = None
+    ):
+        statement = select(*columns) if columns else select(model)
+        if filters:
+            statement = self._apply_filters(statement, filters, model)
+        if sort_by:
+            statement = self._apply_sorting(statement, sort_by, model)
+        return statement.execution_options(yield_per=batch_size)
 
     def _apply_filters(
         self,
@@ -101,31 +832,14 @@ class BaseRepository:
         filters: Dict[str, Dict[str, Any]],
         model,
     ) -> Query:
-        for field_name, spec in filters.items():
-            if not spec:
-                continue
-
-            column = getattr(model, field_name)
-            op = spec["op"]
-            value = spec["value"]
-
-            if op == "eq":
-                query = query.filter(column == value)
-            elif op == "gt":
-                query = query.filter(column > value)
-            elif op == "gte":
-                query = query.filter(column >= value)
-            elif op == "lt":
-                query = query.filter(column < value)
-            elif op == "lte":
-                query = query.filter(column <= value)
-            elif (
-                op == "between" and isinstance(value, (list, tuple)) and len(value) == 2
-            ):
-                query = query.filter(column.between(value[0], value[1]))
-            elif op == "startswith":
-                query = query.filter(column.startswith(value))
-        return query
+        # Works for both Query and Select; values are bound as parameters of a
+        # criterion cached per filter shape (see base.utils.filters).
+        if not filters:
+            return query
+        criterion, params = compile_filters(model, filters)
+        if criterion is None:
+            return query
+        return query.filter(criterion).params(params)
 
     def _apply_sorting(
         self,
@@ -138,6 +852,9 @@ class BaseRepository:
             order = spec["order"]
             if not hasattr(model, column):
                 continue
+            # Sort on the model attribute rather than the name so it also works
+            # for projected selects that don't include the sort column.
+            column = getattr(model, column)
             query = query.order_by(desc(column) if order == "desc" else asc(column))
         return query
 
@@ -147,19 +864,131 @@ class BaseRepository:
         return value
 
     def _model_to_dict(self, model) -> Dict[str, Any]:
-        result = {}
-        for column in model.__table__.columns:
-            value = getattr(model, column.name)
-            result[column.name] = self._to_serializable(value)
-        return result
+        return model_serializer(type(model))(model)
 
     def _row_to_dict(self, row_data, columns: List) -> Dict[str, Any]:
-        result = {}
-        if len(columns) == 1:
-            column_name = columns[0].name
-            result[column_name] = self._to_serializable(row_data)
+        return row_serializer(columns)(row_data)
+
+    def _rows_to_dicts(
+        self, rows, columns: Optional[List] = None
+    ) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        serialize = (
+            row_serializer(columns) if columns else model_serializer(type(rows[0]))
+        )
+        return [serialize(row) for row in rows]
+
+
+class AsyncBaseRepository:
+    """
+    Async variant of a repository for use with an ``AsyncSession``.
+
+    Every call runs the matching ``sync_repository_class`` method through
+    ``AsyncSession.run_sync``: the ORM code is shared with the sync path while the
+    I/O goes through the async driver, so the event loop is free while a query
+    is in flight.
+    """
+
+    sync_repository_class: Type[BaseRepository] = BaseRepository
+
+    def __init__(self, db):
+        self.db = db
+
+    async def _run(self, method_name: str, *args, **kwargs):
+        def call(sync_session):
+            repository = self.sync_repository_class(sync_session)
+            return getattr(repository, method_name)(*args, **kwargs)
+
+        return await self.db.run_sync(call)
+
+    async def create(self, model_instances: List[T]) -> List[str]:
+        return await self._run("create", model_instances)
+
+    async def bulk_create(
+        self,
+        model: Type[T],
+        rows: List[Dict[str, Any]],
+        chunk_size: int = 1000,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        return await self._run("bulk_create", model, rows, chunk_size=chunk_size)
+
+    async def get_by_id(
+        self, model: Type[T], record_id: str
+    ) -> Optional[Dict[str, Any]]:
+        # Serve cache hits without touching the session at all
+        cached = self.sync_repository_class._cache_get(model, record_id)
+        if cached is not None:
+            return cached
+        return await self._run("_load_by_id", model, record_id)
+
+    async def get_version(self, model: Type[T], record_id: str):
+        cached = self.sync_repository_class._cache_get(model, record_id)
+        if cached is not None:
+            return cached["modified_at"]
+        return await self._run("_load_version", model, record_id)
+
+    async def update_by_id(
+        self,
+        model: Type[T],
+        record_id: str,
+        fields_to_update: Union[T, Dict[str, Any]],
+        **kwargs,
+    ) -> Dict[str, Any]:
+        return await self._run(
+            "update_by_id", model, record_id, fields_to_update, **kwargs
+        )
+
+    async def bulk_update(self, model: Type[T], changes, **kwargs) -> Dict[str, Any]:
+        return await self._run("bulk_update", model, changes, **kwargs)
+
+    async def bulk_update_by_filters(
+        self, model: Type[T], filters, values, **kwargs
+    ) -> Dict[str, Any]:
+        return await self._run(
+            "bulk_update_by_filters", model, filters, values, **kwargs
+        )
+
+    async def bulk_delete(self, model: Type[T], ids, **kwargs) -> Dict[str, Any]:
+        return await self._run("bulk_delete", model, ids, **kwargs)
+
+    async def bulk_delete_by_filters(
+        self, model: Type[T], filters, **kwargs
+    ) -> Dict[str, Any]:
+        return await self._run("bulk_delete_by_filters", model, filters, **kwargs)
+
+    async def count_matching(self, model: Type[T], **kwargs) -> int:
+        return await self._run("count_matching", model, **kwargs)
+
+    async def delete_by_id(self, model: Type[T], record_id: str, **kwargs) -> int:
+        return await self._run("delete_by_id", model, record_id, **kwargs)
+
+    async def list(self, **kwargs) -> Dict[str, Any]:
+        return await self._run("list", **kwargs)
+
+    async def explain_list(self, **kwargs) -> Dict[str, Any]:
+        return await self._run("explain_list", **kwargs)
+
+    async def stream(
+        self,
+        *,
+        model,
+        filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        sort_by: Optional[List[Dict[str, Any]]] = None,
+        batch_size: int = 1000,
+        columns: Optional[List] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # A generator can't cross run_sync, so the statement is built by the sync
+        # repository and streamed with AsyncSession.stream (server-side cursor).
+        repository = self.sync_repository_class(self.db.sync_session)
+        statement = repository._build_stream_select(
+            model, filters, sort_by, batch_size, columns
+        )
+        result = await self.db.stream(statement)
+        if columns:
+            serialize = row_serializer(columns)
         else:
-            for i, column in enumerate(columns):
-                column_name = column.name
-                result[column_name] = self._to_serializable(row_data[i])
-        return result
+            serialize = model_serializer(model)
+            result = result.scalars()
+        async for record in result:
+            yield serialize(record)
@@ -1,6 +1,6 @@
 from typing import Union, List, Literal, Optional, Any
 from datetime import date
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class FilterExpression(BaseModel):
@@ -14,7 +14,12 @@ class DateRange(BaseModel):
 
 
 class BaseFilters(BaseModel):
-    pass
+    """
+    Fields of a subclass are ANDed. Subclasses may add ``and_``/``or_`` fields
+    (aliased "and"/"or") holding lists of themselves to compose groups.
+    """
+
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class SortBy(BaseModel):
@@ -25,6 +30,19 @@ class SortBy(BaseModel):
 class PaginationRequest(BaseModel):
     page: int = Field(1, ge=1)
     limit: int = Field(10, ge=1)
+    mode: Literal["offset", "cursor"] = Field(
+        "offset", description="'cursor' enables keyset pagination; page is ignored"
+    )
+    cursor: Optional[str] = Field(
+        None, description="next_cursor from the previous page (cursor mode only)"
+    )
+    count: Literal["exact", "estimated", "none", "has_more"] = Field(
+        "exact",
+        description=(
+            "total_count to return: 'exact', 'estimated' (cheap, may be off), "
+            "'none', or 'has_more' (no count, only whether another page exists)"
+        ),
+    )
 
     @property
     def offset(self) -> int:
@@ -1,12 +1,16 @@
-from typing import List, Type, Dict, Any
+from typing import List, Literal, Type, Dict, Any, Optional
 from pydantic import BaseModel
 
 
 class PaginatedResponse(BaseModel):
     data: List[Any]
-    total_count: int
+    # None unless count_kind is "exact" or "estimated"
+    total_count: Optional[int]
+    count_kind: Literal["exact", "estimated", "none", "has_more"] = "exact"
+    has_more: Optional[bool] = None
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
     @classmethod
     def from_repository_result(
@@ -16,9 +20,15 @@ class PaginatedResponse(BaseModel):
         limit: int,
         record_model: Type[BaseModel],
     ) -> "PaginatedResponse":
-        return cls(
-            data=[record_model(**record) for record in repo_result["data"]],
+        # Repository rows are trusted, so records are constructed without
+        # re-validating every field; unknown keys are dropped by model_construct.
+        construct = record_model.model_construct
+        return cls.model_construct(
+            data=[construct(**record) for record in repo_result["data"]],
             total_count=repo_result["total_count"],
+            count_kind=repo_result.get("count_kind", "exact"),
+            has_more=repo_result.get("has_more"),
             page=page,
             limit=limit,
+            next_cursor=repo_result.get("next_cursor"),
         )
@@ -1,8 +1,8 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional, Dict, Type
+from typing import Any, Callable, List, Optional, Dict, Type, Iterator, AsyncIterator
 from fastapi import HTTPException, status, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from db import get_db
 from base.repository import BaseRepository
 from sqlalchemy.orm import Session
@@ -53,6 +53,66 @@ class BaseService(ABC):
                 detail="Internal server error",
             )
 
+    def bulk_create(
+        self,
+        model_class: Type,
+        request_model: Type[BaseModel],
+        items: List[Dict[str, Any]],
+        chunk_size: int = 1000,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        valid_rows, valid_indexes, errors = self._validate_bulk_items(
+            request_model, items
+        )
+        if not valid_rows:
+            return {"created": [], "errors": errors}
+
+        try:
+            result = self.repository.bulk_create(
+                model_class, valid_rows, chunk_size=chunk_size
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.bulk_create: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+        return self._merge_bulk_result(result, valid_indexes, errors)
+
+    def _validate_bulk_items(
+        self, request_model: Type[BaseModel], items: List[Dict[str, Any]]
+    ) -> tuple[List[Dict[str, Any]], List[int], List[Dict[str, Any]]]:
+        errors = []
+        valid_rows = []
+        valid_indexes = []
+        for index, item in enumerate(items):
+            try:
+                pydantic_obj = request_model.model_validate(item)
+            except ValidationError as e:
+                errors.append({"index": index, "error": str(e)})
+                continue
+            valid_rows.append(pydantic_obj.model_dump(exclude_none=True))
+            valid_indexes.append(index)
+        return valid_rows, valid_indexes, errors
+
+    def _merge_bulk_result(
+        self,
+        result: Dict[str, List[Dict[str, Any]]],
+        valid_indexes: List[int],
+        errors: List[Dict[str, Any]],
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        # Repository indexes refer to the validated rows; map them back to the
+        # positions in the original request.
+        created = [
+            {"index": valid_indexes[row["index"]], "id": row["id"]}
+            for row in result["created"]
+        ]
+        errors.extend(
+            {"index": valid_indexes[row["index"]], "error": row["error"]}
+            for row in result["errors"]
+        )
+        errors.sort(key=lambda row: row["index"])
+        return {"created": created, "errors": errors}
+
     def get_by_id(self, model_class: Type, record_id: str) -> Optional[Dict[str, Any]]:
         try:
             return self.repository.get_by_id(model_class, record_id)
@@ -63,15 +123,31 @@ class BaseService(ABC):
                 detail="Internal server error",
             )
 
+    def get_version(self, model_class: Type, record_id: str):
+        try:
+            return self.repository.get_version(model_class, record_id)
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.get_version: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
     def update_by_id(
-        self, model_class: Type, record_id: str, fields_to_update: BaseModel
+        self,
+        model_class: Type,
+        record_id: str,
+        fields_to_update: BaseModel,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
     ) -> Optional[Dict[str, Any]]:
         try:
-            sqlalchemy_obj_data = self._convert_single_to_sqlalchemy(
-                fields_to_update, model_class
-            )
             return self.repository.update_by_id(
-                model_class, record_id, sqlalchemy_obj_data
+                model_class,
+                record_id,
+                self._update_values(fields_to_update),
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
             )
         except Exception as e:
             logger.error(f"Error in {self.__class__.__name__}.update_by_id: {str(e)}")
@@ -80,9 +156,72 @@ class BaseService(ABC):
                 detail="Internal server error",
             )
 
-    def delete_by_id(self, model_class: Type, record_id: str):
+    def bulk_update(
+        self,
+        model_class: Type,
+        changes: List[tuple[str, BaseModel]],
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        try:
+            return self.repository.bulk_update(
+                model_class,
+                [(record_id, self._update_values(obj)) for record_id, obj in changes],
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.bulk_update: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    def bulk_update_by_filters(
+        self,
+        model_class: Type,
+        filters: BaseFilters,
+        fields_to_update: BaseModel,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
         try:
-            return self.repository.delete_by_id(model_class, record_id)
+            return self.repository.bulk_update_by_filters(
+                model_class,
+                self._process_filters(model_class, filters),
+                self._update_values(fields_to_update),
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            logger.error(
+                f"Error in {self.__class__.__name__}.bulk_update_by_filters: {str(e)}"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    @staticmethod
+    def _update_values(fields_to_update: BaseModel) -> Dict[str, Any]:
+        # exclude_unset rather than exclude_none: an omitted field is left alone
+        # while an explicit null clears the column.
+        return fields_to_update.model_dump(exclude_unset=True)
+
+    def delete_by_id(
+        self,
+        model_class: Type,
+        record_id: str,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        try:
+            return self.repository.delete_by_id(
+                model_class,
+                record_id,
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
         except Exception as e:
             logger.error(f"Error in {self.__class__.__name__}.delete_by_id: {str(e)}")
             raise HTTPException(
@@ -90,6 +229,55 @@ class BaseService(ABC):
                 detail="Internal server error",
             )
 
+    def bulk_delete(
+        self,
+        model_class: Type,
+        ids: Optional[List[str]] = None,
+        filters: Optional[BaseFilters] = None,
+        dry_run: bool = False,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Deletes ``ids`` or every record matching ``filters`` in batches. With
+        ``dry_run`` nothing is deleted and ``deleted`` is the number of records
+        that would be.
+        """
+        try:
+            if ids is not None:
+                if dry_run:
+                    count = self.repository.count_matching(model_class, ids=ids)
+                    return {"deleted": count, "not_found": []}
+                return self.repository.bulk_delete(
+                    model_class,
+                    ids,
+                    snapshot_columns=snapshot_columns,
+                    on_batch=on_batch,
+                )
+            filters = self._process_filters(model_class, filters)
+            if not filters:
+                raise ValueError("Refusing to bulk delete without filters")
+            if dry_run:
+                count = self.repository.count_matching(model_class, filters=filters)
+                return {"deleted": count, "not_found": []}
+            return self.repository.bulk_delete_by_filters(
+                model_class,
+                filters,
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.bulk_delete: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
     def list(
         self,
         model_class: Type,
@@ -97,21 +285,18 @@ class BaseService(ABC):
         sort_by: List[SortBy] = None,
         filters: Optional[BaseFilters] = None,
         columns: Optional[List] = None,
+        search: Optional[str] = None,
     ) -> Dict[str, Any]:
         try:
-            page, limit = self._validate_pagination(pagination.page, pagination.limit)
-            offset = pagination.offset
-            print("Received filters raw:", filters)
-            filters = self._process_filters(model_class, filters)
-            sort_by = self._process_sort_by(model_class, sort_by)
-
             return self.repository.list(
-                model=model_class,
-                filters=filters,
-                sort_by=sort_by,
-                skip=offset,
-                limit=limit,
-                columns=columns,
+                **self._build_list_kwargs(
+                    model_class, pagination, sort_by, filters, columns, search
+                )
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
             )
         except Exception as e:
             logger.error(f"Error in {self.__class__.__name__}.list: {str(e)}")
@@ -120,6 +305,63 @@ class BaseService(ABC):
                 detail="Internal server error",
             )
 
+    def explain_list(
+        self,
+        model_class: Type,
+        pagination: PaginationRequest,
+        sort_by: List[SortBy] = None,
+        filters: Optional[BaseFilters] = None,
+        columns: Optional[List] = None,
+        search: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        kwargs = self._build_list_kwargs(
+            model_class, pagination, sort_by, filters, columns, search
+        )
+        # Only the page query is explained, whatever count mode was requested
+        kwargs.pop("count")
+        return self.repository.explain_list(**kwargs)
+
+    def _build_list_kwargs(
+        self,
+        model_class: Type,
+        pagination: PaginationRequest,
+        sort_by: Optional[List[SortBy]],
+        filters: Optional[BaseFilters],
+        columns: Optional[List],
+        search: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        page, limit = self._validate_pagination(pagination.page, pagination.limit)
+        offset = pagination.offset
+        filters = self._process_filters(model_class, filters)
+        sort_by = self._process_sort_by(model_class, sort_by)
+
+        return dict(
+            model=model_class,
+            filters=filters,
+            sort_by=sort_by,
+            skip=offset,
+            limit=limit,
+            columns=columns,
+            keyset=pagination.mode == "cursor",
+            cursor=pagination.cursor,
+            count=pagination.count,
+            search=search,
+        )
+
+    def stream(
+        self,
+        model_class: Type,
+        sort_by: List[SortBy] = None,
+        filters: Optional[BaseFilters] = None,
+        columns: Optional[List] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        return self.repository.stream(
+            model=model_class,
+            filters=self._process_filters(model_class, filters),
+            sort_by=self._process_sort_by(model_class, sort_by),
+            columns=columns,
+        )
+
     def _validate_pagination(self, page, limit) -> tuple[int, int]:
         page = max(1, page)
         limit = min(max(1, limit), 1000)
@@ -151,7 +393,6 @@ class BaseService(ABC):
 
         for field_name in filters.__annotations__.keys():
             field_value = getattr(filters, field_name, None)
-            print(f"Checking field: {field_name} with value: {field_value}")
 
             if isinstance(field_value, FilterExpression):
                 processed_filters[field_name] = {
@@ -165,5 +406,266 @@ class BaseService(ABC):
                     "value": [field_value.from_, field_value.to],
                 }
 
-        print("Processed filters:", processed_filters)
+            elif isinstance(field_value, list) and field_name.rstrip("_") in (
+                "and",
+                "or",
+            ):
+                # Nested groups combined with AND / OR (see base.utils.filters)
+                groups = [self._process_filters(model, group) for group in field_value]
+                groups = [group for group in groups if group]
+                if groups:
+                    processed_filters[field_name.rstrip("_")] = groups
+
+        logger.debug("Processed filters: %s", processed_filters)
         return processed_filters
+
+
+class AsyncBaseService(BaseService):
+    """
+    Async variant of BaseService for use with an ``AsyncSession`` and an
+    AsyncBaseRepository. Request conversion, pagination and filter processing
+    are shared with the sync service; only the repository calls are awaited.
+    """
+
+    async def create(self, model_class: Type, pydantic_obj: BaseModel) -> str:
+        try:
+            sqlalchemy_obj = self._convert_single_to_sqlalchemy(
+                pydantic_obj, model_class
+            )
+            created_ids = await self.repository.create([sqlalchemy_obj])
+            return created_ids[0]
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.create: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def bulk_create(
+        self,
+        model_class: Type,
+        request_model: Type[BaseModel],
+        items: List[Dict[str, Any]],
+        chunk_size: int = 1000,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        valid_rows, valid_indexes, errors = self._validate_bulk_items(
+            request_model, items
+        )
+        if not valid_rows:
+            return {"created": [], "errors": errors}
+
+        try:
+            result = await self.repository.bulk_create(
+                model_class, valid_rows, chunk_size=chunk_size
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.bulk_create: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+        return self._merge_bulk_result(result, valid_indexes, errors)
+
+    async def get_by_id(
+        self, model_class: Type, record_id: str
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.repository.get_by_id(model_class, record_id)
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.get_by_id: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def get_version(self, model_class: Type, record_id: str):
+        try:
+            return await self.repository.get_version(model_class, record_id)
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.get_version: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def update_by_id(
+        self,
+        model_class: Type,
+        record_id: str,
+        fields_to_update: BaseModel,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.repository.update_by_id(
+                model_class,
+                record_id,
+                self._update_values(fields_to_update),
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.update_by_id: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def bulk_update(
+        self,
+        model_class: Type,
+        changes: List[tuple[str, BaseModel]],
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        try:
+            return await self.repository.bulk_update(
+                model_class,
+                [(record_id, self._update_values(obj)) for record_id, obj in changes],
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.bulk_update: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def bulk_update_by_filters(
+        self,
+        model_class: Type,
+        filters: BaseFilters,
+        fields_to_update: BaseModel,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        try:
+            return await self.repository.bulk_update_by_filters(
+                model_class,
+                self._process_filters(model_class, filters),
+                self._update_values(fields_to_update),
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            logger.error(
+                f"Error in {self.__class__.__name__}.bulk_update_by_filters: {str(e)}"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def delete_by_id(
+        self,
+        model_class: Type,
+        record_id: str,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        try:
+            return await self.repository.delete_by_id(
+                model_class,
+                record_id,
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.delete_by_id: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def bulk_delete(
+        self,
+        model_class: Type,
+        ids: Optional[List[str]] = None,
+        filters: Optional[BaseFilters] = None,
+        dry_run: bool = False,
+        snapshot_columns: Optional[List[str]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Deletes ``ids`` or every record matching ``filters`` in batches. With
+        ``dry_run`` nothing is deleted and ``deleted`` is the number of records
+        that would be.
+        """
+        try:
+            if ids is not None:
+                if dry_run:
+                    count = await self.repository.count_matching(model_class, ids=ids)
+                    return {"deleted": count, "not_found": []}
+                return await self.repository.bulk_delete(
+                    model_class,
+                    ids,
+                    snapshot_columns=snapshot_columns,
+                    on_batch=on_batch,
+                )
+            filters = self._process_filters(model_class, filters)
+            if not filters:
+                raise ValueError("Refusing to bulk delete without filters")
+            if dry_run:
+                count = await self.repository.count_matching(
+                    model_class, filters=filters
+                )
+                return {"deleted": count, "not_found": []}
+            return await self.repository.bulk_delete_by_filters(
+                model_class,
+                filters,
+                snapshot_columns=snapshot_columns,
+                on_batch=on_batch,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.bulk_delete: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    async def list(
+        self,
+        model_class: Type,
+        pagination: PaginationRequest,
+        sort_by: List[SortBy] = None,
+        filters: Optional[BaseFilters] = None,
+        columns: Optional[List] = None,
+        search: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        try:
+            return await self.repository.list(
+                **self._build_list_kwargs(
+                    model_class, pagination, sort_by, filters, columns, search
+                )
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.list: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+
+    def stream(
+        self,
+        model_class: Type,
+        sort_by: List[SortBy] = None,
+        filters: Optional[BaseFilters] = None,
+        columns: Optional[List] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self.repository.stream(
+            model=model_class,
+            filters=self._process_filters(model_class, filters),
+            sort_by=self._process_sort_by(model_class, sort_by),
+            columns=columns,
+        )
@@ -0,0 +1,136 @@
+"""
+Record caches used by repositories for read-through ``get_by_id``.
+
+CacheBackend is the interface a shared backend (e.g. Redis or memcached)
+implements; LRUCache is the in-process implementation. An in-process cache is
+per worker: writes invalidate it locally, and the TTL bounds how stale another
+worker's copy can get.
+
+A read-through fill races with writes: a reader may load a record just before a
+write commits and store it just after the write invalidated the key. Readers
+therefore take a ``fill_token`` before reading and pass it to ``set``, which
+drops the value if the key was invalidated in between.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import monotonic
+from itertools import count
+from typing import Any, Dict, Optional
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value or None on a miss."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, token: Optional[int] = None) -> None:
+        """Stores ``value``; with a ``token``, only if ``key`` wasn't invalidated
+        (deleted or cleared) since the token was taken."""
+
+    def fill_token(self) -> Optional[int]:
+        """Taken before reading a value to cache; None if fills aren't checked."""
+        return None
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe LRU cache bounded by entry count, with a per-entry TTL."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 30):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Invalidation stamps: a global sequence, the last stamp per recently
+        # invalidated key (bounded like the entries) and a floor below which
+        # tokens are refused because their key's stamp may have been dropped
+        self._sequence = count(1)
+        self._stamp = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def fill_token(self) -> int:
+        with self._lock:
+            return self._stamp
+
+    def set(self, key: str, value: Any, token: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if token is not None and (
+                token < self._floor or self._invalidated.get(key, 0) > token
+            ):
+                return
+            self._entries[key] = (monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._stamp = next(self._sequence)
+            self._invalidated[key] = self._stamp
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > max(self.max_size, 1):
+                _, stamp = self._invalidated.popitem(last=False)
+                self._floor = stamp
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stamp = self._floor = next(self._sequence)
+            self._invalidated.clear()
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,84 @@
+"""
+Conditional GET helpers (RFC 9110 validators).
+    record_validators         - ETag and Last-Modified of a record, derived from
+                                its ``modified_at``
+    is_conditional            - whether the request has If-None-Match or
+                                If-Modified-Since
+    is_not_modified           - evaluates those headers against validators
+    not_modified_response     - the 304 response carrying the validators
+    conditional_body_response - ETag from a hash of a rendered body (for results
+                                like list pages that have no single modification
+                                time), 304 when it matches
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import Dict, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+IF_NONE_MATCH = "if-none-match"
+IF_MODIFIED_SINCE = "if-modified-since"
+
+
+def _as_datetime(value: Union[datetime, str]) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def record_validators(modified_at: Union[datetime, str, None]) -> Dict[str, str]:
+    if modified_at is None:
+        return {}
+    modified_at = _as_datetime(modified_at)
+    # Naive timestamps are the server's local time (datetime.now defaults)
+    utc = modified_at.astimezone(timezone.utc)
+    return {
+        "ETag": f'"{utc.strftime("%Y%m%d%H%M%S%f")}"',
+        "Last-Modified": format_datetime(utc, usegmt=True),
+    }
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return IF_NONE_MATCH in headers or IF_MODIFIED_SINCE in headers
+
+
+def is_not_modified(request: Request, validators: Dict[str, str]) -> bool:
+    if_none_match = request.headers.get(IF_NONE_MATCH)
+    etag = validators.get("ETag")
+    # If-None-Match takes precedence; If-Modified-Since is then ignored
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as required for If-None-Match
+        candidates = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get(IF_MODIFIED_SINCE)
+    last_modified = validators.get("Last-Modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return parsedate_to_datetime(last_modified) <= since
+
+
+def not_modified_response(validators: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=validators)
+
+
+def conditional_body_response(request: Request, response: Response) -> Response:
+    validators = {"ETag": f'"{blake2b(response.body, digest_size=16).hexdigest()}"'}
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    response.headers.update(validators)
+    return response
@@ -0,0 +1,57 @@
+"""
+Opaque cursors for keyset pagination.
+A cursor is the url-safe base64 of a small JSON document:
+    s - sort signature, list of [field, order] the cursor was produced for
+    k - values of those fields for the last row of the page
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Tuple
+
+
+def encode_cursor(sort_keys: List[Tuple[str, str]], values: List[Any]) -> str:
+    payload = {
+        "s": [[field, order] for field, order in sort_keys],
+        "k": [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in values
+        ],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_keys: List[Tuple[str, str]], model) -> List[Any]:
+    """
+    Decodes a cursor and converts its values back to the python types of the
+    model columns. Raises ValueError if the cursor is malformed or was produced
+    for a different sort order.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload: Dict[str, Any] = json.loads(base64.urlsafe_b64decode(padded))
+        signature = [tuple(key) for key in payload["s"]]
+        values = payload["k"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+    if signature != [tuple(key) for key in sort_keys] or len(values) != len(sort_keys):
+        raise ValueError("Cursor does not match the requested sort order")
+
+    return [
+        _from_json(getattr(model, field), value)
+        for (field, _), value in zip(sort_keys, values)
+    ]
+
+
+def _from_json(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return value
@@ -0,0 +1,127 @@
+"""
+Query plan and index helpers.
+    explain_statement - runs EXPLAIN for a statement and reports whether the
+                        plan uses an index (Postgres and SQLite)
+    estimate_rows     - the planner's row estimate for a statement (Postgres)
+    ensure_indexes    - creates indexes declared on the models that are missing
+                        from an existing database (create_all only creates them
+                        together with new tables)
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+_SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+# A virtual table (e.g. FTS5) answering a constraint from its own index
+_SQLITE_VIRTUAL_INDEX = re.compile(r"SCAN (\w+) VIRTUAL TABLE INDEX \d+:\S+")
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "sqlite")
+def _compile_explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+
+def explain_statement(db, statement) -> Dict[str, Any]:
+    """
+    :return: dict with the SQL, the plan lines, the indexes the plan uses and
+        ``index_used`` (None when the dialect's plan format isn't understood)
+    """
+    dialect = db.get_bind().dialect.name
+    rows = db.execute(Explain(statement)).all()
+    sql = str(statement.compile(dialect=db.get_bind().dialect))
+
+    if dialect == "postgresql":
+        plan = rows[0][0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        indexes = _postgres_indexes(plan[0]["Plan"])
+        return {
+            "sql": sql,
+            "plan": plan,
+            "indexes": indexes,
+            "index_used": bool(indexes),
+        }
+
+    if dialect == "sqlite":
+        details = [row[-1] for row in rows]
+        indexes = [
+            m.group(1)
+            for d in details
+            for pattern in (_SQLITE_VIRTUAL_INDEX, _SQLITE_INDEX)
+            for m in pattern.finditer(d)
+        ]
+        index_used = bool(indexes) or any("PRIMARY KEY" in d for d in details)
+        return {
+            "sql": sql,
+            "plan": details,
+            "indexes": indexes,
+            "index_used": index_used,
+        }
+
+    return {
+        "sql": sql,
+        "plan": [" ".join(str(value) for value in row) for row in rows],
+        "indexes": [],
+        "index_used": None,
+    }
+
+
+def estimate_rows(db, statement) -> Optional[int]:
+    """Planner's row estimate for ``statement``; None where the database has none."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    plan = db.execute(Explain(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _postgres_indexes(node: Dict[str, Any]) -> List[str]:
+    indexes = []
+    if "Index Name" in node:
+        indexes.append(node["Index Name"])
+    for child in node.get("Plans", []):
+        indexes.extend(_postgres_indexes(child))
+    return indexes
+
+
+def ensure_indexes(engine, metadata) -> List[str]:
+    """Creates any missing indexes declared in ``metadata``; returns their names."""
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing = [index for index in table.indexes if index.name not in existing]
+        for index in missing:
+            # A no-op for indexes limited to other dialects (ddl_if)
+            index.create(engine)
+        if missing:
+            after = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+            created += [index.name for index in missing if index.name in after]
+    return created
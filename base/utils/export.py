@@ -0,0 +1,50 @@
+"""
+Encoders that turn a stream of row dicts into text chunks for a
+StreamingResponse. Rows are buffered into chunks of roughly ``chunk_size``
+characters so the response isn't written one row at a time.
+"""
+
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def ndjson_chunks(
+    rows: AsyncIterator[Dict[str, Any]], chunk_size: int = 65536
+) -> AsyncIterator[str]:
+    buffer = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, default=str) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+async def csv_chunks(
+    rows: AsyncIterator[Dict[str, Any]],
+    fieldnames: List[str],
+    chunk_size: int = 65536,
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
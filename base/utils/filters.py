@@ -0,0 +1,153 @@
+"""
+Compiled filters for repository queries.
+
+Filters arrive as ``{field: {"op": ..., "value": ...}}`` (implicitly ANDed),
+optionally with ``"and"``/``"or"`` keys holding lists of nested filter dicts.
+A filter's shape (fields, operators and nesting, but not values) is compiled
+once into a SQL criterion whose values are bound parameters, and the criterion
+is cached, so repeated queries of the same shape skip building the expression
+and hit SQLAlchemy's compiled-statement cache.
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import and_, bindparam, or_
+
+COMPOSITE_KEYS = ("and", "or")
+
+
+class Operator(NamedTuple):
+    # Builds the criterion for a column from its bound parameters
+    build: Callable[..., Any]
+    # Number of bound parameters the operator takes
+    arity: int
+    # Turns the request value into the parameter values
+    bind: Callable[[Any], Tuple[Any, ...]]
+
+
+def _scalar(value):
+    if isinstance(value, (list, tuple)):
+        raise ValueError("Expected a single value, got a list")
+    return (value,)
+
+
+def _sequence(value):
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("Expected a list of values")
+    return (list(value),)
+
+
+def _pair(value):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError("Expected a [from, to] pair")
+    return tuple(value)
+
+
+def _prefix(value):
+    (value,) = _scalar(value)
+    escaped = str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return (escaped + "%",)
+
+
+def _not_in(column, values):
+    # NULL NOT IN (...) is never true; treat a missing value as "not in the list"
+    criterion = column.not_in(values)
+    return or_(criterion, column.is_(None)) if column.nullable else criterion
+
+
+OPERATORS: Dict[str, Operator] = {
+    "eq": Operator(lambda column, value: column == value, 1, _scalar),
+    "gt": Operator(lambda column, value: column > value, 1, _scalar),
+    "gte": Operator(lambda column, value: column >= value, 1, _scalar),
+    "lt": Operator(lambda column, value: column < value, 1, _scalar),
+    "lte": Operator(lambda column, value: column <= value, 1, _scalar),
+    "in": Operator(lambda column, values: column.in_(values), 1, _sequence),
+    "nin": Operator(_not_in, 1, _sequence),
+    "between": Operator(lambda column, lo, hi: column.between(lo, hi), 2, _pair),
+    "startswith": Operator(
+        lambda column, pattern: column.like(pattern, escape="\\"), 1, _prefix
+    ),
+}
+
+
+def filter_shape(filters: Dict[str, Any]) -> Tuple:
+    """Hashable structure of ``filters`` without the values."""
+    shape = []
+    for key in sorted(filters):
+        spec = filters[key]
+        if key in COMPOSITE_KEYS:
+            shape.append((key, tuple(filter_shape(group) for group in spec)))
+        elif spec:
+            shape.append((key, spec["op"]))
+    return tuple(shape)
+
+
+def filter_values(filters: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """(op, value) of every leaf, in the order of ``filter_shape``."""
+    values = []
+    for key in sorted(filters):
+        spec = filters[key]
+        if key in COMPOSITE_KEYS:
+            for group in spec:
+                values.extend(filter_values(group))
+        elif spec:
+            values.append((spec["op"], spec["value"]))
+    return values
+
+
+def filter_fields(filters: Dict[str, Any]) -> Set[str]:
+    """Every field referenced by ``filters``, including nested groups."""
+    fields = set()
+    for key, spec in filters.items():
+        if key in COMPOSITE_KEYS:
+            for group in spec:
+                fields |= filter_fields(group)
+        elif spec:
+            fields.add(key)
+    return fields
+
+
+@lru_cache(maxsize=512)
+def _compile_shape(model, shape: Tuple) -> Tuple[Any, Tuple[str, ...]]:
+    names = []
+
+    def compile_group(group):
+        criteria = []
+        for key, item in group:
+            if key in COMPOSITE_KEYS:
+                parts = [compile_group(sub) for sub in item]
+                parts = [part for part in parts if part is not None]
+                if parts:
+                    criteria.append(or_(*parts) if key == "or" else and_(*parts))
+                continue
+            if item not in OPERATORS:
+                raise ValueError(f"Unsupported filter operator '{item}' on {key}")
+            column = getattr(model, key, None)
+            if column is None:
+                raise ValueError(f"Unknown filter field '{key}'")
+            operator = OPERATORS[item]
+            params = []
+            for _ in range(operator.arity):
+                name = f"filter_{len(names)}"
+                names.append(name)
+                params.append(bindparam(name, expanding=item in ("in", "nin")))
+            criteria.append(operator.build(column, *params))
+        if not criteria:
+            return None
+        return criteria[0] if len(criteria) == 1 else and_(*criteria)
+
+    return compile_group(shape), tuple(names)
+
+
+def compile_filters(model, filters: Dict[str, Any]) -> Tuple[Optional[Any], Dict]:
+    """
+    :return: the (cached) criterion for ``filters`` on ``model`` and the bound
+        parameter values; the criterion is None when nothing is filtered
+    :raises ValueError: on unknown fields or operators and malformed values
+    """
+    criterion, names = _compile_shape(model, filter_shape(filters))
+    values = []
+    for op, value in filter_values(filters):
+        values.extend(OPERATORS[op].bind(value))
+    return criterion, dict(zip(names, values))
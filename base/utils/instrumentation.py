@@ -0,0 +1,164 @@
+"""
+Request and SQL instrumentation.
+    RequestMetricsMiddleware - ASGI middleware recording per-route latency and,
+                               for each request, how many SQL statements it ran
+                               and how long they took
+    instrument_engine        - engine events timing every statement; statements
+                               are attributed to the request being served
+                               through a context variable
+Requests running more than SQL_STATEMENTS_WARN_THRESHOLD statements (a likely
+N+1) and statements slower than SQL_SLOW_STATEMENT_MS are logged as warnings.
+"""
+
+import logging
+import os
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import event
+
+from base.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+SQL_STATEMENTS_WARN_THRESHOLD = int(os.getenv("SQL_STATEMENTS_WARN_THRESHOLD", "50"))
+SQL_SLOW_STATEMENT_MS = float(os.getenv("SQL_SLOW_STATEMENT_MS", "500"))
+
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "SQL statements executed per HTTP request",
+    ("method", "route"),
+    buckets=STATEMENT_COUNT_BUCKETS,
+)
+REQUEST_SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds",
+    "Total SQL execution time per HTTP request",
+    ("method", "route"),
+)
+SQL_STATEMENT_DURATION = Histogram(
+    "sql_statement_duration_seconds",
+    "SQL statement execution time by engine and statement type",
+    ("engine", "operation"),
+)
+SQL_STATEMENT_ERRORS = Counter(
+    "sql_statement_errors_total",
+    "SQL statements that raised an error",
+    ("engine", "operation"),
+)
+
+
+class SqlTally:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current_tally: ContextVar[Optional[SqlTally]] = ContextVar("sql_tally", default=None)
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:10].split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Times every statement of a sync engine (``async_engine.sync_engine`` for async)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if context is not None:
+            context._instrumentation_start = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        started = getattr(context, "_instrumentation_start", None)
+        if started is None:
+            return
+        elapsed = perf_counter() - started
+        SQL_STATEMENT_DURATION.observe(elapsed, name, _operation(statement))
+        tally = _current_tally.get()
+        if tally is not None:
+            tally.count += 1
+            tally.seconds += elapsed
+        if elapsed * 1000 >= SQL_SLOW_STATEMENT_MS:
+            logger.warning(f"Slow SQL statement ({elapsed * 1000:.1f} ms): {statement}")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        statement = exception_context.statement or ""
+        SQL_STATEMENT_ERRORS.inc(name, _operation(statement))
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    # Depending on the FastAPI version, routes of an included router report
+    # their path without the include prefix; recover it from the request path.
+    try:
+        concrete = route.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return template
+    path = scope["path"]
+    if path != concrete and path.endswith(concrete):
+        return path[: len(path) - len(concrete)] + template
+    return template
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware (unlike BaseHTTPMiddleware it doesn't buffer streaming
+    responses). Routes are labelled by their template, e.g. /v1/expense/{expense_id},
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tally = SqlTally()
+        token = _current_tally.set(tally)
+        status_code = 500
+        started = perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_tally.reset(token)
+            elapsed = perf_counter() - started
+            route_path = _route_template(scope)
+            method = scope["method"]
+            REQUEST_DURATION.observe(elapsed, method, route_path, str(status_code))
+            REQUEST_SQL_STATEMENTS.observe(tally.count, method, route_path)
+            REQUEST_SQL_DURATION.observe(tally.seconds, method, route_path)
+            if tally.count > SQL_STATEMENTS_WARN_THRESHOLD:
+                logger.warning(
+                    f"{method} {route_path} ran {tally.count} SQL statements "
+                    f"({tally.seconds * 1000:.1f} ms)"
+                )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"{method} {route_path} {status_code} in {elapsed * 1000:.1f} ms, "
+                    f"{tally.count} SQL statements ({tally.seconds * 1000:.1f} ms)"
+                )
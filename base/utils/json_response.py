@@ -0,0 +1,32 @@
+"""
+JSON response for payloads that are already trusted (built from database rows).
+Returning it from a route skips FastAPI's response_model validation; pydantic
+models are serialized by pydantic-core in one pass, anything else with the
+standard json module. With ``exclude_unset`` only the fields a constructed
+model was given are written, which is how partial (sparse fieldset) records
+are returned.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, content: Any = None, exclude_unset: bool = False, **kwargs):
+        # Must be set before Response.__init__ calls render()
+        self.exclude_unset = exclude_unset
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(
+                content, exclude_unset=self.exclude_unset, warnings=False
+            )
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
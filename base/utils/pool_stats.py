@@ -0,0 +1,186 @@
+"""
+Connection pool statistics.
+Tracks, per engine:
+    checked out / overflow / idle connections (read live from the pool)
+    checkout wait time histogram (time queued for a connection) and pool timeouts
+    time spent opening new connections
+    lifetime of connections closed by the pool
+Checkouts that wait longer than the configured threshold are logged as warnings.
+"""
+
+import logging
+import threading
+from time import monotonic, perf_counter
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (milliseconds) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# connection_record.info key: time the pool spent opening the connection
+CONNECT_MS = "pool_stats_connect_ms"
+
+
+class PoolStats:
+    def __init__(self, name: str, wait_log_threshold_ms: float = 100):
+        self.name = name
+        self.wait_log_threshold_ms = wait_log_threshold_ms
+        self.engine = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.connect_count = 0
+        self.connect_sum_ms = 0.0
+        self.connect_max_ms = 0.0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.lifetime_sum_s = 0.0
+        self.lifetime_max_s = 0.0
+
+    def attach(self, engine) -> None:
+        """Registers pool event listeners on a (sync) engine."""
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "close", self._on_close)
+
+    @property
+    def pool(self):
+        # Read from the engine each time: engine.dispose() replaces the pool
+        return self.engine.pool if self.engine is not None else None
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.wait_buckets[self._bucket_index(wait_ms)] += 1
+            if timed_out:
+                self.timeouts += 1
+
+        if wait_ms >= self.wait_log_threshold_ms:
+            logger.warning(
+                f"{self.name} pool checkout waited {wait_ms:.1f} ms "
+                f"(timed_out={timed_out}, {self._status()})"
+            )
+
+    def record_connect(self, connect_ms: float) -> None:
+        with self._lock:
+            self.connect_count += 1
+            self.connect_sum_ms += connect_ms
+            self.connect_max_ms = max(self.connect_max_ms, connect_ms)
+
+    @staticmethod
+    def _bucket_index(wait_ms: float) -> int:
+        for index, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                return index
+        return len(WAIT_BUCKETS_MS)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        connection_record.info["opened_at"] = monotonic()
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_close(self, dbapi_connection, connection_record) -> None:
+        opened_at = connection_record.info.pop("opened_at", None)
+        with self._lock:
+            self.connections_closed += 1
+            if opened_at is not None:
+                lifetime = monotonic() - opened_at
+                self.lifetime_sum_s += lifetime
+                self.lifetime_max_s = max(self.lifetime_max_s, lifetime)
+
+    def _status(self) -> str:
+        return self.pool.status() if self.pool is not None else "detached"
+
+    def _live_gauges(self) -> Dict[str, Optional[int]]:
+        gauges = {}
+        for key, method in (
+            ("size", "size"),
+            ("checked_out", "checkedout"),
+            ("checked_in", "checkedin"),
+            ("overflow", "overflow"),
+        ):
+            # Not every pool class (e.g. StaticPool) reports these
+            gauge = getattr(self.pool, method, None)
+            gauges[key] = gauge() if gauge else None
+        return gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets):
+                cumulative += count
+                buckets[f"le_{bound}ms"] = cumulative
+            buckets["le_inf"] = cumulative + self.wait_buckets[-1]
+
+            closed = self.connections_closed or 1
+            return {
+                **self._live_gauges(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum_ms, 3),
+                    "max": round(self.wait_max_ms, 3),
+                    "buckets": buckets,
+                },
+                "connect_ms": {
+                    "count": self.connect_count,
+                    "sum": round(self.connect_sum_ms, 3),
+                    "max": round(self.connect_max_ms, 3),
+                },
+                "connections": {
+                    "opened": self.connections_opened,
+                    "closed": self.connections_closed,
+                    "lifetime_avg_s": round(self.lifetime_sum_s / closed, 3),
+                    "lifetime_max_s": round(self.lifetime_max_s, 3),
+                },
+            }
+
+
+def instrumented_pool_class(pool_class, stats: PoolStats):
+    """
+    Returns a subclass of ``pool_class`` that times how long each checkout waits
+    for a connection. Pool events fire only after a connection is obtained, so
+    the wait has to be measured around the pool's own ``_do_get``. A connection
+    opened inside ``_do_get`` is timed on its own and left out of the wait, so
+    the wait histogram shows queueing, not a slow database handshake. The
+    subclass survives ``pool.recreate()`` (e.g. on ``engine.dispose()``).
+    """
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                stats.record_wait((perf_counter() - start) * 1000, timed_out=True)
+                raise
+            connect_ms = connection.info.pop(CONNECT_MS, 0.0)
+            stats.record_wait((perf_counter() - start) * 1000 - connect_ms)
+            return connection
+
+        def _create_connection(self):
+            start = perf_counter()
+            connection = super()._create_connection()
+            connect_ms = (perf_counter() - start) * 1000
+            connection.info[CONNECT_MS] = connect_ms
+            stats.record_connect(connect_ms)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
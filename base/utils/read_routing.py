@@ -0,0 +1,224 @@
+"""
+Read-replica routing.
+    ReplicaSet               - round-robin over replica engines; a replica that
+                               fails to connect is skipped until REPLICA_RETRY_SECONDS
+                               pass or a health check marks it up again
+    RoutingSession           - Session sending replica-eligible reads to a replica
+                               and everything else to the primary
+    replica_reads            - marks a block of repository reads as replica-eligible
+    ReadYourWritesMiddleware - pins a client's reads to the primary for a while
+                               after its own write
+Only plain SELECTs (no FOR UPDATE) inside ``replica_reads`` go to a replica, and
+only until the session writes: from then on it reads from the primary. Rows read
+from a replica may lag the primary, so they must not populate shared caches.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import List, Optional
+
+from sqlalchemy import Select, event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.requests import cookie_parser
+
+logger = logging.getLogger(__name__)
+
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+REPLICA_READS = "replica_reads"
+WROTE = "wrote"
+READ_YOUR_WRITES_COOKIE = "primary_until"
+
+
+class RequestRouting:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_request_routing: ContextVar[Optional[RequestRouting]] = ContextVar(
+    "request_routing", default=None
+)
+
+
+def reads_pinned_to_primary() -> bool:
+    """True while the current client is inside its read-your-writes window."""
+    routing = _request_routing.get()
+    return routing is not None and routing.pinned
+
+
+def mark_request_wrote() -> None:
+    """Records that the current request wrote (e.g. through another session)."""
+    routing = _request_routing.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+class ReplicaReads:
+    """Yielded by ``replica_reads``: ``used`` tells whether a replica served a read."""
+
+    __slots__ = ("used",)
+
+    def __init__(self):
+        self.used = False
+
+
+class ReplicaSet:
+    def __init__(self, names: List[str], binds: List, retry_seconds: float):
+        self.names = names
+        self.binds = binds
+        self.retry_seconds = retry_seconds
+        self._down_until = [0.0] * len(binds)
+        self._counter = count()
+        self._lock = threading.Lock()
+        for index, bind in enumerate(binds):
+            event.listen(bind, "handle_error", self._error_listener(index))
+
+    def __len__(self) -> int:
+        return len(self.binds)
+
+    def choose(self):
+        """Next healthy replica in round-robin order, or None if all are down."""
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._counter)
+        for offset in range(len(self.binds)):
+            index = (start + offset) % len(self.binds)
+            if self._down_until[index] <= now:
+                return self.binds[index]
+        return None
+
+    def mark(self, index: int, healthy: bool) -> None:
+        was_up = self._down_until[index] <= time.monotonic()
+        self._down_until[index] = (
+            0.0 if healthy else time.monotonic() + self.retry_seconds
+        )
+        if was_up != healthy:
+            state = "up" if healthy else "down"
+            logger.warning(f"Read replica {self.names[index]} marked {state}")
+
+    def healthy(self) -> List[str]:
+        now = time.monotonic()
+        return [
+            name
+            for name, down_until in zip(self.names, self._down_until)
+            if down_until <= now
+        ]
+
+    def _error_listener(self, index: int):
+        def on_error(exception_context):
+            # No connection means connecting itself failed
+            if exception_context.is_disconnect or exception_context.connection is None:
+                self.mark(index, healthy=False)
+
+        return on_error
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._replica_eligible(clause):
+            replica = self.replicas.choose()
+            if replica is not None:
+                self.info[REPLICA_READS].used = True
+                return replica
+        elif self._flushing or isinstance(clause, UpdateBase):
+            self._mark_write()
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def connection(self, *args, **kwargs):
+        # Raw connections are used for bulk writes (COPY, executemany)
+        self._mark_write()
+        return super().connection(*args, **kwargs)
+
+    def _replica_eligible(self, clause) -> bool:
+        return (
+            self.replicas is not None
+            and self.info.get(REPLICA_READS, False)
+            and not self.info.get(WROTE, False)
+            and not self._flushing
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not reads_pinned_to_primary()
+        )
+
+    def _mark_write(self) -> None:
+        self.info[WROTE] = True
+        mark_request_wrote()
+
+
+@contextmanager
+def replica_reads(session):
+    """
+    Lets the SELECTs ``session`` runs inside the block go to a read replica.
+    Yields a ReplicaReads telling afterwards whether one did.
+    """
+    previous = session.info.get(REPLICA_READS, False)
+    reads = session.info[REPLICA_READS] = ReplicaReads()
+    try:
+        yield reads
+    finally:
+        if previous and reads.used:
+            previous.used = True
+        session.info[REPLICA_READS] = previous
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware. A response to a request that wrote to the primary sets
+    a cookie; requests carrying it within ``window_seconds`` read from the
+    primary, so clients see their own writes despite replication lag.
+    """
+
+    def __init__(self, app, window_seconds: float):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.window_seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        routing = RequestRouting(pinned=self._pinned(scope))
+        token = _request_routing.set(routing)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and routing.wrote:
+                until = time.time() + self.window_seconds
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={until:.3f}; "
+                    f"Max-Age={int(self.window_seconds) + 1}; Path=/; "
+                    "HttpOnly; SameSite=Lax"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_routing.reset(token)
+
+    @staticmethod
+    def _pinned(scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookies = cookie_parser(value.decode("latin-1"))
+                try:
+                    until = float(cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+                except ValueError:
+                    return False
+                return until > time.time()
+        return False
@@ -0,0 +1,224 @@
+"""
+Full-text search over text columns of a table.
+
+Terms are runs of letters and digits, matched case-insensitively; a record
+matches when its columns contain every term of the search.
+
+    Postgres - a GIN index on to_tsvector('simple', <columns>), matched with @@
+               and ranked by ts_rank
+    SQLite   - an FTS5 table kept in step with the table by triggers, matched
+               with MATCH and ranked by bm25. FTS5 keys documents by integer
+               rowid, so a side table assigns one per record id (the rowid of a
+               table without an INTEGER PRIMARY KEY may change on VACUUM).
+"""
+
+import logging
+import re
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    bindparam,
+    event,
+    func,
+    literal_column,
+    text,
+)
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r"\w+")
+# connection_record.info key: the connection has loaded the FTS5 tables
+_FTS_LOADED = "search_fts_loaded"
+# Every SearchIndex, for prepare_sqlite_connection
+_INDEXES: List["SearchIndex"] = []
+# Text search configuration without stemming or stop words: plain tokens
+_CONFIG = literal_column("'simple'")
+
+
+def search_terms(search: str) -> List[str]:
+    return _TERM.findall(search.lower())
+
+
+def prepare_sqlite_connection(dbapi_connection, connection_record, connection_proxy):
+    """
+    Pool checkout listener for SQLite engines. The first statement touching an
+    FTS5 table on a connection reads its configuration; inside a deferred
+    write transaction that read takes a shared lock that can't wait to be
+    upgraded, so concurrent writes would fail with "database is locked"
+    instead of waiting their turn. Loading the tables at checkout, outside
+    any transaction, avoids that.
+    """
+    if connection_record.info.get(_FTS_LOADED):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for index in _INDEXES:
+            cursor.execute(f"SELECT 1 FROM {index.fts.name} LIMIT 0")
+        connection_record.info[_FTS_LOADED] = True
+    except Exception:
+        pass  # not installed yet; retried on the next checkout
+    finally:
+        cursor.close()
+
+
+class SearchIndex:
+    def __init__(self, table: Table, columns: Sequence[str]):
+        self.table = table
+        self.columns = tuple(columns)
+        self.name = f"{table.name}_search"
+        self.key = key = table.primary_key.columns.values()[0]
+
+        # Declared on the table so create_all, ensure_indexes and the generator's
+        # --defer-indexes handle it like the other indexes.
+        self.postgres_index = Index(
+            f"ix_{table.name}_search", self.document(), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql")
+        table.append_constraint(self.postgres_index)
+
+        # Query-side descriptions of the SQLite tables; created by install()
+        metadata = MetaData()
+        self.fts = Table(
+            f"{self.name}_fts",
+            metadata,
+            Column("rowid", Integer),
+            Column("rank"),
+            *(Column(name, Text) for name in self.columns),
+        )
+        self.ids = Table(
+            f"{self.name}_ids",
+            metadata,
+            Column("doc_id", Integer, primary_key=True),
+            Column(key.name, String, unique=True),
+        )
+        event.listen(table.metadata, "after_create", self._after_create)
+        _INDEXES.append(self)
+
+    def document(self):
+        """The tsvector the Postgres index is built on (constants inlined so the
+        expression in queries matches the indexed one)."""
+        parts = [
+            func.coalesce(self.table.c[name], literal_column("''"))
+            for name in self.columns
+        ]
+        combined = parts[0]
+        for part in parts[1:]:
+            combined = combined.op("||")(literal_column("' '")).op("||")(part)
+        return func.to_tsvector(_CONFIG, combined)
+
+    def apply(self, query, search: str, dialect: str) -> Tuple:
+        """
+        Restricts ``query`` (a Query or Select on the table) to records matching
+        ``search``.
+
+        :return: the query and the ORDER BY clause ranking best matches first
+        :raises ValueError: when ``search`` has no terms, or on other databases
+        """
+        terms = search_terms(search)
+        if not terms:
+            raise ValueError("search must contain at least one letter or digit")
+        if dialect == "postgresql":
+            tsquery = func.plainto_tsquery(
+                _CONFIG, bindparam("search_terms", " ".join(terms))
+            )
+            document = self.document()
+            query = query.filter(document.op("@@")(tsquery))
+            return query, func.ts_rank(document, tsquery).desc()
+        if dialect == "sqlite":
+            # Quoted terms are plain tokens, never FTS5 query syntax
+            match = " ".join(f'"{term}"' for term in terms)
+            query = (
+                query.join(self.ids, self.ids.c[self.key.name] == self.key)
+                .join(self.fts, self.fts.c.rowid == self.ids.c.doc_id)
+                .filter(
+                    literal_column(self.fts.name).op("MATCH")(
+                        bindparam("search_terms", match)
+                    )
+                )
+            )
+            # bm25: lower is a better match
+            return query, self.fts.c.rank.asc()
+        raise ValueError(f"Text search is not supported on {dialect}")
+
+    def install(self, connection) -> bool:
+        """
+        Creates the SQLite FTS tables and triggers if missing and indexes the
+        existing records. Returns whether anything was created.
+        """
+        if connection.dialect.name != "sqlite":
+            return False
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+            {"name": self.fts.name},
+        ).first()
+        if exists:
+            return False
+        for statement in self._sqlite_ddl():
+            connection.exec_driver_sql(statement)
+        self._backfill(connection)
+        logger.info(f"Created search index {self.fts.name}")
+        return True
+
+    def drop(self, connection) -> None:
+        """Drops the SQLite FTS tables and triggers (install() rebuilds them)."""
+        if connection.dialect.name != "sqlite":
+            return
+        for action in ("insert", "update", "delete"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {self.name}_{action}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.fts.name}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.ids.name}")
+
+    def _after_create(self, target, connection, **kw) -> None:
+        self.install(connection)
+
+    def _sqlite_ddl(self) -> List[str]:
+        table, fts, ids, key = (
+            self.table.name,
+            self.fts.name,
+            self.ids.name,
+            self.key.name,
+        )
+        columns = ", ".join(self.columns)
+        new_values = ", ".join(f"new.{name}" for name in self.columns)
+        assignments = ", ".join(f"{name} = new.{name}" for name in self.columns)
+        doc_id = f"(SELECT doc_id FROM {ids} WHERE {key} = old.{key})"
+        return [
+            f"CREATE TABLE {ids} (doc_id INTEGER PRIMARY KEY, {key} TEXT NOT NULL UNIQUE)",
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns})",
+            f"""CREATE TRIGGER {self.name}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {ids} ({key}) VALUES (new.{key});
+                INSERT INTO {fts} (rowid, {columns})
+                VALUES ((SELECT doc_id FROM {ids} WHERE {key} = new.{key}), {new_values});
+            END""",
+            f"""CREATE TRIGGER {self.name}_update AFTER UPDATE OF {columns} ON {table}
+            BEGIN
+                UPDATE {fts} SET {assignments} WHERE rowid = {doc_id};
+            END""",
+            f"""CREATE TRIGGER {self.name}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = {doc_id};
+                DELETE FROM {ids} WHERE {key} = old.{key};
+            END""",
+        ]
+
+    def _backfill(self, connection) -> None:
+        table, fts, ids, key = (
+            self.table.name,
+            self.fts.name,
+            self.ids.name,
+            self.key.name,
+        )
+        columns = ", ".join(self.columns)
+        selected = ", ".join(f"t.{name}" for name in self.columns)
+        connection.exec_driver_sql(
+            f"INSERT INTO {ids} ({key}) SELECT {key} FROM {table}"
+        )
+        connection.exec_driver_sql(
+            f"INSERT INTO {fts} (rowid, {columns}) "
+            f"SELECT i.doc_id, {selected} FROM {table} t JOIN {ids} i ON i.{key} = t.{key}"
+        )
@@ -0,0 +1,64 @@
+"""
+Row serializers compiled once per model (or per column list) and reused.
+Column accessors and the set of date/time columns needing ``isoformat`` are
+resolved up front, so turning a row into a dict is one C-level attrgetter
+call plus a conversion of the temporal columns only.
+"""
+
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, List, Sequence
+
+from sqlalchemy import Date, DateTime, Time
+from sqlalchemy import inspect as sa_inspect
+
+_TEMPORAL_TYPES = (Date, DateTime, Time)
+_model_serializers: Dict[type, Callable[[Any], Dict[str, Any]]] = {}
+
+
+def _is_temporal(column) -> bool:
+    return isinstance(column.type, _TEMPORAL_TYPES)
+
+
+def _build(names: List[str], getter, temporal: List[str]):
+    if len(names) == 1:
+        # attrgetter/itemgetter with a single key returns a scalar, not a tuple
+        name = names[0]
+
+        def serialize_one(source) -> Dict[str, Any]:
+            value = getter(source)
+            if temporal and value is not None:
+                value = value.isoformat()
+            return {name: value}
+
+        return serialize_one
+
+    def serialize(source) -> Dict[str, Any]:
+        result = dict(zip(names, getter(source)))
+        for name in temporal:
+            value = result[name]
+            if value is not None:
+                result[name] = value.isoformat()
+        return result
+
+    return serialize
+
+
+def model_serializer(model_class) -> Callable[[Any], Dict[str, Any]]:
+    """Returns the (cached) serializer turning an ORM instance into a dict keyed by column name."""
+    serializer = _model_serializers.get(model_class)
+    if serializer is None:
+        mapper = sa_inspect(model_class)
+        columns = list(model_class.__table__.columns)
+        names = [column.name for column in columns]
+        attributes = [mapper.get_property_by_column(column).key for column in columns]
+        temporal = [column.name for column in columns if _is_temporal(column)]
+        serializer = _build(names, attrgetter(*attributes), temporal)
+        _model_serializers[model_class] = serializer
+    return serializer
+
+
+def row_serializer(columns: Sequence) -> Callable[[Any], Dict[str, Any]]:
+    """Serializer for result rows of a projected select over ``columns``."""
+    names = [column.name for column in columns]
+    temporal = [column.name for column in columns if _is_temporal(column)]
+    return _build(names, itemgetter(*range(len(names))), temporal)
@@ -14,6 +14,20 @@ def int_to_base63(snowflake_int):
     return "".join(base63_string)
 
 
+def int_to_base63_batch(snowflake_ints):
+    """Converts many positive integers into base63 strings (see int_to_base63)."""
+    chars = base63_chars
+    encoded = []
+    append = encoded.append
+    for snowflake_int in snowflake_ints:
+        digits = []
+        while snowflake_int > 0:
+            snowflake_int, remainder = divmod(snowflake_int, 63)
+            digits.append(chars[remainder])
+        append("".join(digits))
+    return encoded
+
+
 def generate_primary_key(prefix=""):
     """
     :type prefix: str
@@ -23,8 +37,21 @@ def generate_primary_key(prefix=""):
     return prefix + "_" + get_short_id()
 
 
+def generate_primary_keys(count, prefix=""):
+    """
+    :type count: int
+    :param count: number of keys to generate
+    :type prefix: str
+    :param prefix: prefix of model
+    :return: list of str
+    """
+    prefix = prefix + "_"
+    ids = get_snowflake_generator().next_batch(count)
+    return [prefix + short_id for short_id in int_to_base63_batch(ids)]
+
+
 def get_short_id():
     """
     Gets the next integer snowflake id from the generator and converts it to base63
     """
-    return int_to_base63(next(get_snowflake_generator()))
+    return int_to_base63(get_snowflake_generator().next_id())
@@ -0,0 +1,156 @@
+"""
+Mergeable quantile sketches with a relative-error guarantee (DDSketch-style).
+
+Values are counted in logarithmic buckets: bucket i holds the values in
+(gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so every quantile is
+answered within a relative error ``a`` (RELATIVE_ACCURACY) of the true value.
+Unlike t-digest or KLL, bucket counts also support removals (a negative count)
+and two sketches merge by adding counts bucket by bucket, which a database can
+do with SUM. The number of buckets depends on the range of the values (about
+1,400 from 0.0001 to 10^8 at 1%), not on how many were added.
+
+    bucket_of      - the bucket key of a value; keys are ordered like values
+                     (0 holds zero, negative values have negative keys)
+    bucket_value   - the value a bucket stands for
+    QuantileSketch - bucket counts answering quantiles and histograms
+    PendingBuckets - thread-safe count deltas per (key, bucket) waiting to be
+                     written
+    bucket_deltas  - folds removed and added values into such deltas
+"""
+
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+# Persisted bucket keys depend on it: rebuild stored sketches after changing it
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+# Magnitudes below this count as zero
+MIN_VALUE = 1e-4
+# Shifts bucket indexes so every non-zero magnitude gets a key >= 1
+_OFFSET = 1 - math.ceil(math.log(MIN_VALUE) / _LOG_GAMMA)
+
+
+def bucket_of(value: float) -> int:
+    magnitude = abs(value)
+    if magnitude < MIN_VALUE:
+        return 0
+    key = max(1, math.ceil(math.log(magnitude) / _LOG_GAMMA) + _OFFSET)
+    return key if value > 0 else -key
+
+
+def bucket_value(key: int) -> float:
+    if key == 0:
+        return 0.0
+    # The point with the same relative distance to both bucket bounds
+    value = 2 * GAMMA ** (abs(key) - _OFFSET) / (GAMMA + 1)
+    return value if key > 0 else -value
+
+
+class QuantileSketch:
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts: Dict[int, int] = dict(counts or {})
+
+    def add(self, value: float, count: int = 1) -> None:
+        key = bucket_of(value)
+        self.counts[key] = self.counts.get(key, 0) + count
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def _buckets(self) -> List[Tuple[int, int]]:
+        # Transiently negative buckets (a removal applied first) hold nothing
+        return sorted((key, count) for key, count in self.counts.items() if count > 0)
+
+    @property
+    def count(self) -> int:
+        return sum(count for _, count in self._buckets())
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Values at the ``qs`` (each in [0, 1]); None for an empty sketch."""
+        buckets = self._buckets()
+        total = sum(count for _, count in buckets)
+        if not total:
+            return [None] * len(qs)
+        results = {}
+        # One pass over the buckets for all quantiles, lowest rank first
+        targets = sorted((q * (total - 1), q) for q in qs)
+        position, seen = 0, 0
+        for key, count in buckets:
+            seen += count
+            while position < len(targets) and targets[position][0] < seen:
+                results[targets[position][1]] = bucket_value(key)
+                position += 1
+            if position == len(targets):
+                break
+        return [results[q] for q in qs]
+
+    def bounds(self) -> Tuple[Optional[float], Optional[float]]:
+        """Smallest and largest value, within the relative accuracy."""
+        buckets = self._buckets()
+        if not buckets:
+            return None, None
+        return bucket_value(buckets[0][0]), bucket_value(buckets[-1][0])
+
+    def histogram(self, edges: Sequence[float]) -> List[Tuple[float, float, int]]:
+        """
+        Counts between consecutive ``edges`` (ascending), plus the values below
+        the first and above the last edge (bounded by -inf/inf), as
+        ``(lower, upper, count)`` for non-empty bins only. Values near an edge
+        may land in the neighbouring bin (relative accuracy).
+        """
+        bins = [-math.inf, *edges, math.inf]
+        counts = [0] * (len(bins) - 1)
+        position = 0
+        for key, count in self._buckets():
+            value = bucket_value(key)
+            while value > bins[position + 1]:
+                position += 1
+            counts[position] += count
+        return [
+            (bins[i], bins[i + 1], count) for i, count in enumerate(counts) if count
+        ]
+
+
+class PendingBuckets:
+    """
+    Bucket count deltas per sketch key accumulated between writes to storage.
+    ``take`` hands them over and starts afresh; ``restore`` puts them back
+    after a failed write. ``epoch`` is the version of the stored sketches the
+    deltas apply to, kept up to date by the caller (None until known).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas: Dict[Tuple[Hashable, int], int] = defaultdict(int)
+        self.epoch: Optional[int] = None
+
+    def add(self, deltas: Dict[Tuple[Hashable, int], int]) -> None:
+        with self._lock:
+            for key, count in deltas.items():
+                self._deltas[key] += count
+
+    def take(self) -> Dict[Tuple[Hashable, int], int]:
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+        return {key: count for key, count in deltas.items() if count}
+
+    restore = add
+
+    def __len__(self) -> int:
+        return len(self._deltas)
+
+
+def bucket_deltas(
+    removed: Iterable[Tuple[Hashable, float]] = (),
+    added: Iterable[Tuple[Hashable, float]] = (),
+) -> Dict[Tuple[Hashable, int], int]:
+    """Folds ``(sketch key, value)`` pairs into count deltas per (key, bucket)."""
+    deltas = defaultdict(int)
+    for sign, values in ((-1, removed), (1, added)):
+        for key, value in values:
+            deltas[(key, bucket_of(value))] += sign
+    return {key: count for key, count in deltas.items() if count}
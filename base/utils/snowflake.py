@@ -4,36 +4,127 @@ id structure:
     epoch timestamp in millisecond - 41 bits
     node id - 10 bits --> 1024 nodes
     process id - 5 bits --> 32 process ids
-    sequence no - 5 bits --> 32 request per millisecond (5k TPS)
+    sequence no - 7 bits --> 128 ids per millisecond per process
 """
 
 import os
+import threading
 import uuid
-from datetime import datetime, timezone
-from time import sleep
+from time import monotonic_ns, sleep, time_ns
+from typing import List
+from base.utils.worker_lease import claim_process_slot, process_lease
 
 # Wednesday, 1 January 2020 00:00:00 GMT
 startepoch = 1577836800000
 mult = 1000
 node_id_bits = 10
 process_id_bits = 5
-sequence_bits = 5
+sequence_bits = 7
 process_id_mask = -1 ^ (-1 << process_id_bits)
 node_id_mask = -1 ^ (-1 << node_id_bits)
 process_id_shift = sequence_bits
 node_id_shift = sequence_bits + process_id_bits
 timestamp_left_shift = sequence_bits + process_id_bits + node_id_bits
 sequence_mask = -1 ^ (-1 << sequence_bits)
+# How far (ms) the allocator may run ahead of the clock before it waits
+max_clock_lead_ms = 1000
 snowflake_generator = None
+_snowflake_generator_lock = threading.Lock()
 
 
 def get_snowflake_generator():
+    """
+    Returns the process wide SnowflakeAllocator. It is an iterator, so
+    ``next(get_snowflake_generator())`` keeps working, and it is safe to share
+    between threads. The process id part of the worker id is a slot leased
+    through base.utils.worker_lease, unique per node while the process lives.
+    """
     global snowflake_generator
-    if not snowflake_generator:
-        snowflake_generator = snowflake_id_gen()
+    if not snowflake_generator or snowflake_generator.pid != os.getpid():
+        with _snowflake_generator_lock:
+            if not snowflake_generator or snowflake_generator.pid != os.getpid():
+                # A forked child must not reuse its parent's worker id
+                node_id = uuid.getnode() & node_id_mask
+                process_slot = claim_process_slot(node_id, process_id_mask + 1)
+                snowflake_generator = SnowflakeAllocator(
+                    create_worker_id(node_id=node_id, process_id=process_slot),
+                    lease=process_lease(),
+                )
     return snowflake_generator
 
 
+class SnowflakeAllocator:
+    """
+    Thread-safe snowflake id allocator.
+
+    Time comes from ``time.monotonic_ns`` anchored to the wall clock once at
+    start-up, so wall clock adjustments can't make it go backwards. When the
+    sequence of the current millisecond is used up, the allocator borrows the
+    next millisecond instead of sleeping, up to ``max_clock_lead_ms`` ahead of
+    the clock; past that it waits for the clock to catch up. The same logic
+    covers a regressing clock: ids keep coming from the last used millisecond.
+    With a ``lease``, no ids are issued (RuntimeError) while it isn't held.
+
+    Usage::
+        >> allocator = SnowflakeAllocator(create_worker_id())
+        >> allocator.next_id()
+        >> allocator.next_batch(5000)
+    """
+
+    def __init__(self, worker_id, max_lead_ms=max_clock_lead_ms, lease=None):
+        self.worker_id = worker_id
+        self.max_lead_ms = max_lead_ms
+        self.lease = lease
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._clock_offset_ns = time_ns() - monotonic_ns()
+        self._last_timestamp = -1
+        self._next_sequence = 0
+
+    def _now_ms(self):
+        return (monotonic_ns() + self._clock_offset_ns) // 1_000_000
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next_id()
+
+    def next_id(self):
+        return self.next_batch(1)[0]
+
+    def next_batch(self, count) -> List[int]:
+        """
+        Reserves ``count`` ids in one call. Ids within a millisecond are
+        consecutive integers, so a batch is a handful of contiguous ranges.
+        """
+        if self.lease is not None:
+            self.lease.check()
+        ids = []
+        with self._lock:
+            while len(ids) < count:
+                now = self._now_ms()
+                if now > self._last_timestamp:
+                    self._last_timestamp = now
+                    self._next_sequence = 0
+                elif self._next_sequence > sequence_mask:
+                    lead = self._last_timestamp - now
+                    if lead >= self.max_lead_ms:
+                        sleep(lead / mult)
+                        continue
+                    self._last_timestamp += 1
+                    self._next_sequence = 0
+
+                take = min(count - len(ids), sequence_mask + 1 - self._next_sequence)
+                base = (
+                    (self._last_timestamp - startepoch) << timestamp_left_shift
+                ) | self.worker_id
+                start = base + self._next_sequence
+                ids.extend(range(start, start + take))
+                self._next_sequence += take
+        return ids
+
+
 def snowflake_id_gen(node_id=None, process_id=None):
     """
     initializer method which constructs and returns a snowflake id generator object
@@ -69,8 +160,8 @@ def create_worker_id(node_id=None, process_id=None):
     :return:
     :rtype:
     """
-    node_id = node_id or uuid.getnode()
-    process_id = process_id or os.getpid()
+    node_id = uuid.getnode() if node_id is None else node_id
+    process_id = os.getpid() if process_id is None else process_id
     node_id = node_id & node_id_mask
     process_id = process_id & process_id_mask
     worker_id = (node_id << node_id_shift) | (process_id << process_id_shift)
@@ -83,40 +174,15 @@ def generator(worker_id):
     id structure:
             epoch timestamp in millisecond - 41 bits
             worker id - 15 bits --> 32767 unique worker ids
-            sequence no - 5 bits --> 32 request per millisecond (5k TPS)
-    pseudocode:
-            compute utc time in milliseconds
-            initialise sequence number to 0
-            construct unique snowflake id using the above structure.
-                Use left shift to move the timestamp bits to accommodate the worker id and sequence no
-                Use left shift to move the worker id to accommodate the sequence no
-                Use bitwise OR operator to merge all three entities --> timestamp | worker_id | sequence id
+            sequence no - 7 bits --> 128 ids per millisecond
+    Ids are handed out by a SnowflakeAllocator, see its docstring for how the
+    clock and sequence are managed.
     :param worker_id:
     :type worker_id:
     :return:
     :rtype:
     """
-    last_timestamp = -1
-    sequence = 0
-
-    while True:
-        timestamp = int(datetime.now(timezone.utc).timestamp() * mult)
-        if last_timestamp == timestamp:
-            sequence = (sequence + 1) & sequence_mask
-            if sequence == 0:
-                sequence = -1 & sequence_mask
-                # sleep for 1 millisecond if Sequence number becomes 0 to ensure
-                # that next iteration succeeds with the next set of sequence numbers
-                sleep(1 / mult)
-                continue
-        else:
-            sequence = 0
-
-        last_timestamp = timestamp
-
-        yield (
-            ((timestamp - startepoch) << timestamp_left_shift) | worker_id | sequence
-        )
+    yield from SnowflakeAllocator(worker_id)
 
 
 def snowflake_id_gen_for_timestamp(timestamp):
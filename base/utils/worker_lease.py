@@ -0,0 +1,359 @@
+"""
+Leases for the 5-bit snowflake process id.
+Deriving the process id from ``os.getpid() & 0x1f`` lets two workers on the same
+node collide. Instead each process leases a free slot (0-31) for its node at
+start-up and releases it at exit.
+
+Backends (chosen with SNOWFLAKE_WORKER_LEASE):
+    file     - one lock file per slot under SNOWFLAKE_LEASE_DIR, held with flock.
+               The OS drops the lock when a process dies, so crashed workers'
+               slots are reclaimed immediately. Covers processes on one host.
+    database - a row per (node_id, slot) in snowflake_worker_leases with an
+               expiry renewed by a heartbeat thread. Slots of crashed workers are
+               reclaimed once their lease expires. Expiries are set and compared
+               on the database clock, so clock skew between hosts doesn't matter. A process whose lease lapsed
+               (renewals failing for a TTL) or was taken over stops issuing
+               ids until it holds the slot again.
+    none     - legacy behaviour, process id taken from os.getpid().
+"""
+
+import atexit
+import logging
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from time import monotonic
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LEASE_BACKEND = os.getenv("SNOWFLAKE_WORKER_LEASE", "file")
+LEASE_DIR = os.getenv(
+    "SNOWFLAKE_LEASE_DIR", os.path.join(tempfile.gettempdir(), "snowflake-slots")
+)
+LEASE_TTL_SECONDS = int(os.getenv("SNOWFLAKE_LEASE_TTL_SECONDS", "60"))
+
+_current_lease = None
+_current_lease_pid = None
+_lease_lock = threading.Lock()
+
+
+class WorkerLease(ABC):
+    def __init__(self, node_id: int, slots: int):
+        self.node_id = node_id
+        self.slots = slots
+        self.slot: Optional[int] = None
+        # Process that acquired the lease; a forked child inherits the object
+        # (and its atexit hook) but must never release the parent's slot.
+        self.pid = os.getpid()
+
+    @abstractmethod
+    def acquire(self) -> int:
+        """Claims a free slot and returns it. Raises RuntimeError if none is free."""
+
+    @abstractmethod
+    def release(self) -> None:
+        pass
+
+    def detach(self) -> None:
+        """Drops an inherited lease in a forked child without releasing it."""
+
+    def check(self) -> None:
+        """Raises RuntimeError when the slot may be held by another process."""
+
+    def _owner(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class FileLockWorkerLease(WorkerLease):
+    def __init__(self, node_id: int, slots: int, directory: str = LEASE_DIR):
+        super().__init__(node_id, slots)
+        self.directory = os.path.join(directory, str(node_id))
+        self._fd = None
+
+    def acquire(self) -> int:
+        import fcntl
+
+        os.makedirs(self.directory, exist_ok=True)
+        for slot in range(self.slots):
+            path = os.path.join(self.directory, f"slot-{slot}.lock")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            os.ftruncate(fd, 0)
+            os.write(fd, self._owner().encode())
+            self._fd = fd
+            self.slot = slot
+            self.pid = os.getpid()
+            return slot
+        raise RuntimeError(
+            f"All {self.slots} snowflake worker slots in {self.directory} are taken"
+        )
+
+    def release(self) -> None:
+        if self._fd is not None and self.pid == os.getpid():
+            # Closing the descriptor drops the flock
+            os.close(self._fd)
+            self._fd = None
+            self.slot = None
+
+    def detach(self) -> None:
+        # The child's copy of the descriptor shares the parent's lock; closing
+        # it leaves the parent's lock in place.
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class DatabaseWorkerLease(WorkerLease):
+    def __init__(
+        self, node_id: int, slots: int, engine, ttl_seconds: int = LEASE_TTL_SECONDS
+    ):
+        super().__init__(node_id, slots)
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{self._owner()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._heartbeat = None
+        # Monotonic time until which no other process can have claimed the slot
+        self._valid_until = 0.0
+
+    @staticmethod
+    def _table():
+        from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+
+        metadata = MetaData()
+        return Table(
+            "snowflake_worker_leases",
+            metadata,
+            Column("node_id", Integer, primary_key=True),
+            Column("slot", Integer, primary_key=True),
+            Column("owner", String, nullable=False),
+            Column("expires_at", DateTime, nullable=False),
+        )
+
+    def _db_time(self, seconds: int = 0):
+        """SQL expression: UTC time of the database clock plus ``seconds``."""
+        from sqlalchemy import Interval, func, literal
+
+        if self.engine.dialect.name == "sqlite":
+            return func.strftime("%Y-%m-%d %H:%M:%f", "now", f"{seconds:+d} seconds")
+        return func.timezone("utc", func.now()) + literal(
+            timedelta(seconds=seconds), Interval()
+        )
+
+    def acquire(self) -> int:
+        from sqlalchemy import and_, insert, select, update
+        from sqlalchemy.exc import IntegrityError
+
+        table = self._table()
+        table.create(self.engine, checkfirst=True)
+        now, expiry = self._db_time(), self._db_time(self.ttl_seconds)
+
+        with self.engine.connect() as connection:
+            # slot -> whether its lease has expired
+            taken = dict(
+                connection.execute(
+                    select(table.c.slot, table.c.expires_at < now).where(
+                        table.c.node_id == self.node_id
+                    )
+                ).all()
+            )
+            for slot in range(self.slots):
+                started = monotonic()
+                try:
+                    if slot not in taken:
+                        connection.execute(
+                            insert(table).values(
+                                node_id=self.node_id,
+                                slot=slot,
+                                owner=self.owner,
+                                expires_at=expiry,
+                            )
+                        )
+                    elif taken[slot]:
+                        # Expired lease of a crashed worker; the expiry check in
+                        # the WHERE clause keeps two claimants from both winning.
+                        result = connection.execute(
+                            update(table)
+                            .where(
+                                and_(
+                                    table.c.node_id == self.node_id,
+                                    table.c.slot == slot,
+                                    table.c.expires_at < now,
+                                )
+                            )
+                            .values(owner=self.owner, expires_at=expiry)
+                        )
+                        if result.rowcount != 1:
+                            connection.rollback()
+                            continue
+                    else:
+                        continue
+                    connection.commit()
+                except IntegrityError:
+                    connection.rollback()
+                    continue
+
+                self.slot = slot
+                self.pid = os.getpid()
+                self._valid_until = started + self.ttl_seconds
+                self._start_heartbeat()
+                return slot
+
+        raise RuntimeError(
+            f"All {self.slots} snowflake worker slots for node {self.node_id} are leased"
+        )
+
+    def _start_heartbeat(self) -> None:
+        self._heartbeat = threading.Thread(
+            target=self._renew_forever, name="snowflake-lease", daemon=True
+        )
+        self._heartbeat.start()
+
+    def check(self) -> None:
+        if monotonic() >= self._valid_until:
+            raise RuntimeError(
+                f"Snowflake lease for node {self.node_id} slot {self.slot} is not "
+                "held; refusing to issue ids that could collide"
+            )
+
+    def _renew_forever(self) -> None:
+        while not self._stop.wait(self.ttl_seconds / 3):
+            started = monotonic()
+            try:
+                renewed = self._renew()
+            except Exception as e:
+                # check() refuses ids once the last renewal is a TTL old
+                logger.error(f"Error renewing snowflake worker lease: {str(e)}")
+                continue
+            if renewed:
+                self._valid_until = started + self.ttl_seconds
+            else:
+                self._valid_until = 0.0
+                logger.error(
+                    f"Snowflake lease for node {self.node_id} slot {self.slot} is "
+                    "held by another process; no ids are issued until it is free"
+                )
+
+    def _renew(self) -> bool:
+        """
+        Extends the lease. The slot is taken back if its row expired unclaimed
+        or disappeared (e.g. a restored database). Returns False if another
+        process holds it.
+        """
+        from sqlalchemy import and_, insert, or_, update
+        from sqlalchemy.exc import IntegrityError
+
+        table = self._table()
+        now, expiry = self._db_time(), self._db_time(self.ttl_seconds)
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                update(table)
+                .where(
+                    and_(
+                        table.c.node_id == self.node_id,
+                        table.c.slot == self.slot,
+                        or_(table.c.owner == self.owner, table.c.expires_at < now),
+                    )
+                )
+                .values(owner=self.owner, expires_at=expiry)
+            )
+            if result.rowcount == 1:
+                return True
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    insert(table).values(
+                        node_id=self.node_id,
+                        slot=self.slot,
+                        owner=self.owner,
+                        expires_at=expiry,
+                    )
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def release(self) -> None:
+        from sqlalchemy import and_, delete
+
+        if self.pid != os.getpid():
+            return
+        self._stop.set()
+        if self.slot is None:
+            return
+        table = self._table()
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    delete(table).where(
+                        and_(
+                            table.c.node_id == self.node_id,
+                            table.c.slot == self.slot,
+                            table.c.owner == self.owner,
+                        )
+                    )
+                )
+        except Exception as e:
+            logger.error(f"Error releasing snowflake worker lease: {str(e)}")
+        self.slot = None
+
+
+def _make_lease(node_id: int, slots: int) -> Optional[WorkerLease]:
+    if LEASE_BACKEND == "none":
+        return None
+    if LEASE_BACKEND == "database":
+        from db import get_engine
+
+        return DatabaseWorkerLease(node_id, slots, get_engine())
+    if LEASE_BACKEND == "file":
+        return FileLockWorkerLease(node_id, slots)
+    raise ValueError(f"Unknown SNOWFLAKE_WORKER_LEASE backend: {LEASE_BACKEND}")
+
+
+def claim_process_slot(node_id: int, slots: int) -> Optional[int]:
+    """
+    Returns this process's leased slot, claiming one on first use (and again
+    in a forked child, which must not share its parent's slot). Returns None
+    when leasing is disabled.
+    """
+    global _current_lease, _current_lease_pid
+    with _lease_lock:
+        if _current_lease_pid == os.getpid():
+            return _current_lease.slot if _current_lease else None
+        if _current_lease is not None:
+            _current_lease.detach()
+
+        lease = _make_lease(node_id, slots)
+        if lease is not None:
+            lease.acquire()
+            atexit.register(lease.release)
+            logger.info(f"Leased snowflake process slot {lease.slot} on node {node_id}")
+        _current_lease = lease
+        _current_lease_pid = os.getpid()
+        return lease.slot if lease else None
+
+
+def process_lease() -> Optional[WorkerLease]:
+    """The lease claimed by claim_process_slot in this process, if any."""
+    with _lease_lock:
+        if _current_lease_pid == os.getpid():
+            return _current_lease
+        return None
+
+
+def release_process_slot() -> None:
+    global _current_lease, _current_lease_pid
+    with _lease_lock:
+        if _current_lease is not None and _current_lease_pid == os.getpid():
+            _current_lease.release()
+        _current_lease = None
+        _current_lease_pid = None
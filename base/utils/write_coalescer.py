@@ -0,0 +1,140 @@
+"""
+Group commit for single-row writes.
+
+WriteCoalescer collects the items concurrent requests ``submit`` for up to
+``window_seconds`` (or until ``max_batch`` items are waiting) and hands them to
+one ``flush`` call, typically a bulk insert in a single transaction. ``flush``
+returns one outcome per item, a result or an Exception, and every caller is
+resumed with its own. One commit per batch instead of one per request lifts
+the fsync-bound write rate at the cost of up to one window of added latency.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+from time import perf_counter
+from typing import Any, Awaitable, Callable, List, Optional
+
+from base.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+WRITE_COALESCE_ENABLED = os.getenv("WRITE_COALESCE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+WRITE_COALESCE_WINDOW_MS = float(os.getenv("WRITE_COALESCE_WINDOW_MS", "5"))
+WRITE_COALESCE_MAX_BATCH = int(os.getenv("WRITE_COALESCE_MAX_BATCH", "100"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+BATCH_SIZE = Histogram(
+    "write_coalescer_batch_size",
+    "Items per coalesced write batch",
+    ("coalescer",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+BATCH_WAIT = Histogram(
+    "write_coalescer_wait_seconds",
+    "Time an item waited for its batch to start flushing",
+    ("coalescer",),
+)
+BATCH_FLUSH_DURATION = Histogram(
+    "write_coalescer_flush_duration_seconds",
+    "Time to write a coalesced batch",
+    ("coalescer",),
+)
+BATCH_FLUSHES = Counter(
+    "write_coalescer_flushes_total",
+    "Coalesced batches by what triggered the flush (window, full, drain)",
+    ("coalescer", "reason"),
+)
+BATCH_ERRORS = Counter(
+    "write_coalescer_errors_total",
+    "Coalesced items that failed, by whether the whole batch failed",
+    ("coalescer", "scope"),
+)
+
+
+class WriteCoalescer:
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[List[Any]], Awaitable[List[Any]]],
+        window_seconds: float = WRITE_COALESCE_WINDOW_MS / 1000,
+        max_batch: int = WRITE_COALESCE_MAX_BATCH,
+    ):
+        self.name = name
+        self.flush = flush
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        # (item, future, enqueued at)
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Queues ``item`` and returns its outcome once its batch is written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush("full")
+        elif self._timer is None:
+            self._timer = loop.call_later(
+                self.window_seconds, self._start_flush, "window"
+            )
+        return await future
+
+    async def drain(self) -> None:
+        """Flushes what is waiting and waits for every batch in flight."""
+        if self._pending:
+            self._start_flush("drain")
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def _start_flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        BATCH_FLUSHES.inc(self.name, reason)
+        # A fresh context: the batch belongs to no single request
+        task = asyncio.create_task(self._flush(batch), context=contextvars.Context())
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        started = perf_counter()
+        BATCH_SIZE.observe(len(batch), self.name)
+        for _, _, enqueued_at in batch:
+            BATCH_WAIT.observe(started - enqueued_at, self.name)
+        batch_failed = False
+        try:
+            outcomes = await self.flush([item for item, _, _ in batch])
+            if len(outcomes) != len(batch):
+                raise RuntimeError(
+                    f"{self.name} flush returned {len(outcomes)} outcomes "
+                    f"for {len(batch)} items"
+                )
+        except Exception as e:
+            logger.error(f"Error flushing {self.name} batch of {len(batch)}: {str(e)}")
+            BATCH_ERRORS.inc(self.name, "batch", amount=len(batch))
+            outcomes = [e] * len(batch)
+            batch_failed = True
+        finally:
+            BATCH_FLUSH_DURATION.observe(perf_counter() - started, self.name)
+
+        for (_, future, _), outcome in zip(batch, outcomes):
+            if future.done():  # the caller went away
+                continue
+            if isinstance(outcome, Exception):
+                if not batch_failed:
+                    BATCH_ERRORS.inc(self.name, "item")
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
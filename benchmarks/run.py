@@ -0,0 +1,445 @@
+"""
+Benchmarks for the repository and API layers.
+
+Drives the FastAPI app in-process through its ASGI interface (no server, no
+HTTP client) against a throwaway SQLite database, or the database given with
+--database-url. Seeds --rows expenses, then measures throughput and latency
+percentiles per scenario and writes the results as JSON for comparing runs.
+
+Usage:
+    python -m benchmarks.run [--rows 20000] [--iterations 200] [--seed 42]
+                             [--database-url postgresql://...] [--output out.json]
+                             [--only list_shallow,get_by_id]
+
+Running against an existing database writes to it; point it at a scratch one.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CATEGORIES = ["food", "rent", "travel", "utilities", "health", "fun", None]
+
+
+class ASGIClient:
+    """Calls an ASGI app directly, the way a server would, one request at a time."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan_queue: Optional[asyncio.Queue] = None
+        self._lifespan_task = None
+
+    async def request(
+        self, method: str, path: str, body: Any = None
+    ) -> Tuple[int, bytes]:
+        payload = b"" if body is None else json.dumps(body).encode()
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [
+                (b"host", b"benchmark"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("benchmark", 80),
+        }
+        messages = [{"type": "http.request", "body": payload, "more_body": False}]
+        status = 0
+        chunks = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    async def json(self, method: str, path: str, body: Any = None) -> Any:
+        status, content = await self.request(method, path, body)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} returned {status}: {content[:200]!r}")
+        return json.loads(content)
+
+    async def startup(self) -> None:
+        self._lifespan_queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            return await self._lifespan_queue.get()
+
+        async def send(message):
+            if message["type"].startswith("lifespan.startup") and not started.done():
+                started.set_result(message)
+
+        async def run():
+            try:
+                await self.app(
+                    {"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send
+                )
+            except Exception as e:
+                if not started.done():
+                    started.set_exception(e)
+
+        self._lifespan_task = asyncio.create_task(run())
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        message = await started
+        if message["type"] == "lifespan.startup.failed":
+            raise RuntimeError(f"App startup failed: {message.get('message')}")
+
+    async def shutdown(self) -> None:
+        if self._lifespan_task is None:
+            return
+        await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+        await asyncio.wait([self._lifespan_task], timeout=10)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize(
+    name: str, latencies: List[float], elapsed: float, items_per_op: int = 1
+) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    operations = len(ordered)
+    return {
+        "name": name,
+        "operations": operations,
+        "items_per_operation": items_per_op,
+        "elapsed_s": round(elapsed, 6),
+        "ops_per_s": round(operations / elapsed, 2) if elapsed else None,
+        "items_per_s": (
+            round(operations * items_per_op / elapsed, 2) if elapsed else None
+        ),
+        "mean_ms": round(sum(ordered) / operations * 1000, 4) if operations else None,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 4),
+        "p90_ms": round(percentile(ordered, 0.90) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else None,
+    }
+
+
+async def measure(
+    name: str,
+    operation: Callable[[int], Any],
+    iterations: int,
+    warmup: int,
+    items_per_op: int = 1,
+) -> Dict[str, Any]:
+    for index in range(warmup):
+        await operation(index)
+    latencies = []
+    started = time.perf_counter()
+    for index in range(iterations):
+        op_started = time.perf_counter()
+        await operation(warmup + index)
+        latencies.append(time.perf_counter() - op_started)
+    return summarize(name, latencies, time.perf_counter() - started, items_per_op)
+
+
+def measure_sync(
+    name: str, operation: Callable[[], Any], iterations: int, items_per_op: int = 1
+) -> Dict[str, Any]:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - op_started)
+    return summarize(name, latencies, time.perf_counter() - started, items_per_op)
+
+
+IMPORT_PROBE = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import(iterations: int) -> Dict[str, Any]:
+    """Times ``import main`` in fresh interpreters (what each worker pays at boot)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=root,
+        ).stdout
+        latencies.append(float(output.strip().splitlines()[-1]))
+    return summarize("import_main", latencies, time.perf_counter() - started)
+
+
+def make_expense(rng: random.Random) -> Dict[str, Any]:
+    day = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    return {
+        "amount": round(rng.lognormvariate(3, 1), 2),
+        "description": f"benchmark expense {rng.randrange(10**6)}",
+        "category": rng.choice(CATEGORIES),
+        "expense_date": day.isoformat(),
+    }
+
+
+async def seed(client: ASGIClient, rng: random.Random, rows: int) -> List[str]:
+    ids = []
+    for start in range(0, rows, 5000):
+        items = [make_expense(rng) for _ in range(min(5000, rows - start))]
+        result = await client.json("POST", "/v1/expense/bulk", {"items": items})
+        ids.extend(row["id"] for row in result["created"])
+    return ids
+
+
+def list_body(page: int = 1, limit: int = 50, cursor: Optional[str] = None):
+    pagination = {"page": page, "limit": limit}
+    if cursor is not None:
+        pagination.update(mode="cursor", cursor=cursor or None)
+    return {
+        "filters": {"category": {"op": "in", "value": ["food", "rent", "travel"]}},
+        "sort_by": [{"field": "created_at", "order": "desc"}],
+        "pagination": pagination,
+    }
+
+
+async def deep_cursor(client: ASGIClient, depth: int) -> Optional[str]:
+    """Walks cursor pages until ``depth`` rows have been skipped."""
+    cursor = ""
+    skipped = 0
+    while skipped < depth:
+        page = await client.json(
+            "POST",
+            "/v1/expense/list",
+            list_body(limit=min(1000, depth - skipped), cursor=cursor),
+        )
+        skipped += len(page["data"])
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return None
+    return cursor
+
+
+async def run_benchmarks(args, scenarios: Optional[set]) -> List[Dict[str, Any]]:
+    import main
+    from base.utils.short_id import generate_primary_key, generate_primary_keys
+    from expense.repository import expense_cache
+
+    def wanted(name: str) -> bool:
+        return scenarios is None or name in scenarios
+
+    rng = random.Random(args.seed)
+    client = ASGIClient(main.app)
+    await client.startup()
+    results = []
+    try:
+        seed_started = time.perf_counter()
+        ids = await seed(client, rng, args.rows)
+        print(
+            f"seeded {len(ids)} expenses in {time.perf_counter() - seed_started:.1f}s",
+            file=sys.stderr,
+        )
+        n = args.iterations
+        warmup = args.warmup
+
+        if wanted("id_generation"):
+            results.append(measure_sync("id_generation", generate_primary_key, n * 50))
+        if wanted("id_generation_batch"):
+            results.append(
+                measure_sync(
+                    "id_generation_batch", lambda: generate_primary_keys(1000), n, 1000
+                )
+            )
+
+        if wanted("create"):
+
+            async def create(_):
+                await client.json("POST", "/v1/expense/", make_expense(rng))
+
+            results.append(await measure("create", create, n, warmup))
+
+        if wanted("bulk_create"):
+
+            async def bulk_create(_):
+                items = [make_expense(rng) for _ in range(args.bulk_size)]
+                await client.json("POST", "/v1/expense/bulk", {"items": items})
+
+            results.append(
+                await measure(
+                    "bulk_create",
+                    bulk_create,
+                    max(1, n // 20),
+                    1,
+                    args.bulk_size,
+                )
+            )
+
+        if wanted("get_by_id"):
+
+            async def get_cold(_):
+                expense_cache.clear()
+                await client.json("GET", f"/v1/expense/{rng.choice(ids)}")
+
+            results.append(await measure("get_by_id", get_cold, n, warmup))
+
+        if wanted("get_by_id_cached"):
+            hot = ids[:50]
+
+            async def get_cached(index):
+                await client.json("GET", f"/v1/expense/{hot[index % len(hot)]}")
+
+            results.append(await measure("get_by_id_cached", get_cached, n, warmup))
+
+        deep_page = max(1, int(args.rows * 0.9 * 3 / len(CATEGORIES)) // 50)
+        for name, body in (
+            ("list_shallow", list_body(page=1)),
+            ("list_deep", list_body(page=deep_page)),
+        ):
+            if wanted(name):
+
+                async def list_page(_, body=body):
+                    await client.json("POST", "/v1/expense/list", body)
+
+                results.append(await measure(name, list_page, n, warmup))
+
+        if wanted("list_cursor_shallow"):
+
+            async def list_cursor_first(_):
+                await client.json("POST", "/v1/expense/list", list_body(cursor=""))
+
+            results.append(
+                await measure("list_cursor_shallow", list_cursor_first, n, warmup)
+            )
+
+        if wanted("list_cursor_deep"):
+            cursor = await deep_cursor(client, (deep_page - 1) * 50)
+            if cursor:
+
+                async def list_cursor_deep(_):
+                    await client.json(
+                        "POST", "/v1/expense/list", list_body(cursor=cursor)
+                    )
+
+                results.append(
+                    await measure("list_cursor_deep", list_cursor_deep, n, warmup)
+                )
+
+        if wanted("list_search"):
+
+            async def list_search(_):
+                body = list_body()
+                body["search"] = f"expense {rng.randrange(10**6)}"
+                await client.json("POST", "/v1/expense/list", body)
+
+            results.append(await measure("list_search", list_search, n, warmup))
+    finally:
+        await client.shutdown()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000, help="expenses to seed")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--bulk-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--database-url",
+        help="database to run against (default: a new SQLite file in a temp dir)",
+    )
+    parser.add_argument(
+        "--output", help="write the JSON results here (default: stdout)"
+    )
+    parser.add_argument("--only", help="comma-separated scenario names to run")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="expense-bench-") as scratch:
+        database_url = args.database_url or f"sqlite:///{scratch}/bench.db"
+        # db.py reads the URL at import time (engines are created on first use)
+        os.environ["DATABASE_URL"] = database_url
+        os.environ.setdefault("SNOWFLAKE_LEASE_DIR", os.path.join(scratch, "slots"))
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        scenarios = set(args.only.split(",")) if args.only else None
+        results = []
+        if scenarios is None or "import_main" in scenarios:
+            results.append(measure_import(max(1, args.iterations // 20)))
+        results.extend(asyncio.run(run_benchmarks(args, scenarios)))
+
+    import sqlalchemy
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "database": database_url.split(":", 1)[0],
+            "rows": args.rows,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    for result in results:
+        print(
+            f"{result['name']:<22} {result['ops_per_s']:>10} ops/s  "
+            f"p50 {result['p50_ms']:>9} ms  p99 {result['p99_ms']:>9} ms",
+            file=sys.stderr,
+        )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,43 @@
+import json
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Annotated, Any, List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from expense.schemas import (
     GetExpenseResponse,
     CreateExpenseRequest,
     CreateExpenseResponse,
+    BulkCreateExpenseRequest,
+    BulkCreateExpenseResponse,
     UpdateExpenseRequest,
     UpdateExpenseResponse,
+    BulkUpdateExpenseRequest,
+    BulkUpdateExpenseResponse,
+    BulkDeleteExpenseRequest,
+    BulkDeleteExpenseResponse,
     DeleteExpenseResponse,
     ListExpenseRequest,
     ListExpenseResponse,
+    ExportExpenseRequest,
+    SummaryExpenseRequest,
+    SummaryExpenseResponse,
+    ExpenseStatsRequest,
+    ExpenseStatsResponse,
 )
-from db import get_db
-from sqlalchemy.orm import Session
-from expense.service import ExpenseService
+from db import get_async_db, get_async_sessionmaker
+from base.utils.export import EXPORT_MEDIA_TYPES
+from base.utils.conditional import (
+    conditional_body_response,
+    is_conditional,
+    is_not_modified,
+    not_modified_response,
+    record_validators,
+)
+from base.utils.json_response import FastJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from expense.service import AsyncExpenseService
 
 
 logger = logging.getLogger(__name__)
@@ -22,25 +47,148 @@ router = APIRouter(prefix="/expense", tags=["Expense"])
 
 @router.post("/", response_model=CreateExpenseResponse)
 async def create_expense(
-    request: CreateExpenseRequest, db: Session = Depends(get_db)
+    request: CreateExpenseRequest, db: AsyncSession = Depends(get_async_db)
 ) -> CreateExpenseResponse:
     try:
-        service = ExpenseService(db)
-        result = service.create_expense(request)
+        service = AsyncExpenseService(db)
+        result = await service.create_expense(request)
         return CreateExpenseResponse(id=result, message="Expense created successfully")
     except Exception as e:
         logger.error(f"Error in create_expense: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/bulk", response_model=BulkCreateExpenseResponse)
+async def bulk_create_expense(
+    request: BulkCreateExpenseRequest, db: AsyncSession = Depends(get_async_db)
+) -> BulkCreateExpenseResponse:
+    try:
+        service = AsyncExpenseService(db)
+        return await service.bulk_create_expense(request)
+    except Exception as e:
+        logger.error(f"Error in bulk_create_expense: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.patch("/bulk", response_model=BulkUpdateExpenseResponse)
+async def bulk_update_expense(
+    request: BulkUpdateExpenseRequest, db: AsyncSession = Depends(get_async_db)
+) -> BulkUpdateExpenseResponse:
+    try:
+        service = AsyncExpenseService(db)
+        return await service.bulk_update_expense(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in bulk_update_expense: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/delete", response_model=BulkDeleteExpenseResponse)
+async def bulk_delete_expense(
+    request: BulkDeleteExpenseRequest, db: AsyncSession = Depends(get_async_db)
+) -> BulkDeleteExpenseResponse:
+    try:
+        service = AsyncExpenseService(db)
+        return await service.bulk_delete_expense(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in bulk_delete_expense: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def _export_response(request: ExportExpenseRequest) -> StreamingResponse:
+    # The stream outlives the request dependencies, so it opens its own session.
+    async def body():
+        async with get_async_sessionmaker()() as db:
+            service = AsyncExpenseService(db)
+            async for chunk in service.export_expense(request):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[request.format],
+        headers={
+            "Content-Disposition": f'attachment; filename="expenses.{request.format}"'
+        },
+    )
+
+
+def _query_json(name: str, value: Optional[str]) -> Any:
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError as e:
+        raise RequestValidationError(
+            [{"type": "json_invalid", "loc": ("query", name), "msg": str(e)}]
+        )
+
+
+@router.get("/export")
+async def export_all_expenses(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: Annotated[
+        Optional[str],
+        Query(description='As JSON, e.g. {"category": {"op": "eq", "value": "food"}}'),
+    ] = None,
+    sort_by: Annotated[
+        Optional[str],
+        Query(description='As JSON, e.g. [{"field": "created_at", "order": "desc"}]'),
+    ] = None,
+    fields: Annotated[Optional[List[str]], Query()] = None,
+) -> StreamingResponse:
+    """GET form of POST /export, for links and curl: filters and sort_by are JSON."""
+    try:
+        request = ExportExpenseRequest.model_validate(
+            {
+                "filters": _query_json("filters", filters),
+                "sort_by": _query_json("sort_by", sort_by) or [],
+                "format": format,
+                "fields": fields,
+            }
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return _export_response(request)
+
+
+@router.post("/export")
+async def export_expenses(request: ExportExpenseRequest) -> StreamingResponse:
+    return _export_response(request)
+
+
+@router.get("/stats", response_model=ExpenseStatsResponse)
+async def expense_stats(
+    request: Annotated[ExpenseStatsRequest, Query()],
+    db: AsyncSession = Depends(get_async_db),
+) -> ExpenseStatsResponse:
+    try:
+        service = AsyncExpenseService(db)
+        return await service.expense_stats(request)
+    except Exception as e:
+        logger.error(f"Error in expense_stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.get("/{expense_id}", response_model=GetExpenseResponse)
 async def get_expense(
-    expense_id: str, db: Session = Depends(get_db)
+    expense_id: str, http_request: Request, db: AsyncSession = Depends(get_async_db)
 ) -> GetExpenseResponse:
     try:
-        service = ExpenseService(db)
-        result = service.get_expense_by_id(expense_id)
-        return GetExpenseResponse(data=result)
+        service = AsyncExpenseService(db)
+        if is_conditional(http_request):
+            # Only the version is looked up; the record isn't loaded unless it changed
+            modified_at = await service.get_expense_version(expense_id)
+            validators = record_validators(modified_at)
+            if is_not_modified(http_request, validators):
+                return not_modified_response(validators)
+        result = await service.get_expense_by_id(expense_id)
+        return FastJSONResponse(
+            GetExpenseResponse.model_construct(data=result),
+            headers=record_validators(result.modified_at),
+        )
     except Exception as e:
         logger.error(f"Error in get_expense: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -48,11 +196,13 @@ async def get_expense(
 
 @router.put("/{expense_id}", response_model=UpdateExpenseResponse)
 async def update_expense(
-    expense_id: str, request: UpdateExpenseRequest, db: Session = Depends(get_db)
+    expense_id: str,
+    request: UpdateExpenseRequest,
+    db: AsyncSession = Depends(get_async_db),
 ) -> UpdateExpenseResponse:
     try:
-        service = ExpenseService(db)
-        result = service.update_expense(expense_id, request)
+        service = AsyncExpenseService(db)
+        result = await service.update_expense(expense_id, request)
         return UpdateExpenseResponse(
             id=result["id"],
             modified_at=result["modified_at"],
@@ -65,11 +215,11 @@ async def update_expense(
 
 @router.delete("/{expense_id}", response_model=DeleteExpenseResponse)
 async def delete_expense(
-    expense_id: str, db: Session = Depends(get_db)
+    expense_id: str, db: AsyncSession = Depends(get_async_db)
 ) -> DeleteExpenseResponse:
     try:
-        service = ExpenseService(db)
-        result = service.delete_expense_by_id(expense_id)
+        service = AsyncExpenseService(db)
+        result = await service.delete_expense_by_id(expense_id)
         return DeleteExpenseResponse(message=result)
     except Exception as e:
         logger.error(f"Error in get_expense: {str(e)}")
@@ -78,12 +228,31 @@ async def delete_expense(
 
 @router.post("/list", response_model=ListExpenseResponse)
 async def list_expense(
-    request: ListExpenseRequest, db: Session = Depends(get_db)
+    request: ListExpenseRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db),
 ) -> ListExpenseResponse:
     try:
-        service = ExpenseService(db)
-        return service.list_expense(request)
+        service = AsyncExpenseService(db)
+        result = await service.list_expense(request)
+        return conditional_body_response(
+            http_request, FastJSONResponse(result, exclude_unset=True)
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in list_expenses: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/summary", response_model=SummaryExpenseResponse)
+async def summarize_expense(
+    request: SummaryExpenseRequest, db: AsyncSession = Depends(get_async_db)
+) -> SummaryExpenseResponse:
+    try:
+        service = AsyncExpenseService(db)
+        return await service.summarize_expense(request)
+    except Exception as e:
+        logger.error(f"Error in summarize_expense: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -0,0 +1,47 @@
+"""
+Reports the query plan of POST /v1/expense/list for a request body.
+
+Usage::
+    python -m expense.explain '{"filters": {"category": {"op": "startswith", "value": "tr"}}}'
+    echo '{"sort_by": [{"field": "created_at", "order": "desc"}]}' | python -m expense.explain
+    python -m expense.explain --ensure-indexes
+"""
+
+import argparse
+import json
+import sys
+
+from db import Base, get_engine, get_sessionmaker, prepare_schema
+from base.utils.explain import ensure_indexes
+from expense.schemas import ListExpenseRequest
+from expense.service import ExpenseService
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("request", nargs="?", help="ListExpenseRequest JSON")
+    parser.add_argument(
+        "--ensure-indexes",
+        action="store_true",
+        help="create indexes declared on the models that the database lacks",
+    )
+    args = parser.parse_args(argv)
+
+    prepare_schema()
+    if args.ensure_indexes:
+        created = ensure_indexes(get_engine(), Base.metadata)
+        print(json.dumps({"created_indexes": created}, indent=2))
+        return
+
+    body = json.loads(args.request if args.request else sys.stdin.read() or "{}")
+    request = ListExpenseRequest(**body)
+    db = get_sessionmaker()()
+    try:
+        report = ExpenseService(db).explain_list_expense(request)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Generates synthetic expenses for scale testing and loads them in bulk.
+
+Usage::
+    python -m expense.generate --rows 10000000 --seed 7
+    python -m expense.generate --rows 1000000 --start 2022-01-01 --end 2024-12-31
+
+The data is shaped like real spending: Zipf-skewed categories (a few percent
+uncategorized), seasonal and weekly peaks in ``expense_date`` with growth over
+the range, and log-normal amounts per category with a Pareto tail. Batches
+are generated column-wise with NumPy when it is installed (pure Python
+otherwise) and inserted through ``BaseRepository.bulk_create`` (COPY on
+PostgreSQL with psycopg2), which also assigns snowflake ids. Everything but
+the ids is deterministic for a given seed and backend.
+
+Loading into a large existing table is much faster with --defer-indexes, which
+drops the indexes declared on Expense (and SQLite's search tables) and
+recreates them after the load.
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+from db import Base, get_engine, get_sessionmaker, prepare_schema
+from base.utils.explain import ensure_indexes
+from expense.models import Expense, expense_search_index
+from expense.repository import (
+    ExpenseRepository,
+    ExpenseRollupRepository,
+    ExpenseStatsRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+# (category, log-normal mu of the amount); listed by popularity
+CATEGORIES = [
+    ("food", 2.8),
+    ("groceries", 3.6),
+    ("transport", 2.5),
+    ("shopping", 3.9),
+    ("utilities", 4.4),
+    ("entertainment", 3.3),
+    ("health", 4.0),
+    ("travel", 5.6),
+    ("rent", 7.2),
+    ("education", 5.0),
+    ("gifts", 3.8),
+    ("insurance", 5.3),
+]
+ZIPF_EXPONENT = 1.1
+UNCATEGORIZED_RATE = 0.03
+AMOUNT_SIGMA = 0.9
+# Share of amounts multiplied by a Pareto(TAIL_ALPHA) factor
+TAIL_RATE = 0.005
+TAIL_ALPHA = 1.5
+NO_DESCRIPTION_RATE = 0.1
+# Share of rows modified some time after creation
+MODIFIED_RATE = 0.2
+DESCRIPTIONS = [
+    "card payment",
+    "online order",
+    "monthly bill",
+    "cash",
+    "subscription",
+    "refund adjustment",
+    "team expense",
+    "reimbursable",
+]
+COLUMNS = (
+    "amount",
+    "description",
+    "category",
+    "expense_date",
+    "created_at",
+    "modified_at",
+)
+
+
+def category_weights() -> List[float]:
+    weights = [1 / rank**ZIPF_EXPONENT for rank in range(1, len(CATEGORIES) + 1)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def day_weights(start: date, end: date) -> List[float]:
+    """Relative likelihood of each day in [start, end]."""
+    days = (end - start).days + 1
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        day_of_year = day.timetuple().tm_yday
+        # December shopping peak and a smaller summer (travel) peak
+        seasonal = (
+            1
+            + 0.35 * math.cos(2 * math.pi * (day_of_year - 350) / 365.25)
+            + 0.15 * math.cos(2 * math.pi * (day_of_year - 200) / 365.25)
+        )
+        weekly = 1.25 if day.weekday() >= 5 else 1.0
+        growth = 1 + 0.5 * offset / max(1, days - 1)
+        weights.append(seasonal * weekly * growth)
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+class ExpenseGenerator:
+    def __init__(self, seed: int, start: date, end: date):
+        if end < start:
+            raise ValueError("end must not be before start")
+        self.start = start
+        self.category_weights = category_weights()
+        self.day_weights = day_weights(start, end)
+        if np is not None:
+            self.rng = np.random.default_rng(seed)
+        else:
+            self.rng = random.Random(seed)
+
+    def batch(self, size: int) -> List[Dict[str, Any]]:
+        columns = (
+            self._numpy_batch(size) if np is not None else self._python_batch(size)
+        )
+        return [dict(zip(COLUMNS, values)) for values in zip(*columns)]
+
+    def _numpy_batch(self, size: int) -> List[list]:
+        rng = self.rng
+        names = np.array([name for name, _ in CATEGORIES] + [None], dtype=object)
+        mus = np.array([mu for _, mu in CATEGORIES] + [3.5])
+
+        category_index = rng.choice(len(CATEGORIES), size=size, p=self.category_weights)
+        category_index[rng.random(size) < UNCATEGORIZED_RATE] = len(CATEGORIES)
+
+        amounts = rng.lognormal(mus[category_index], AMOUNT_SIGMA)
+        tail = rng.random(size) < TAIL_RATE
+        amounts[tail] *= 1 + rng.pareto(TAIL_ALPHA, tail.sum())
+        amounts = np.maximum(np.round(amounts, 2), 0.01)
+
+        descriptions = np.array(DESCRIPTIONS + [None], dtype=object)
+        description_index = rng.integers(0, len(DESCRIPTIONS), size)
+        description_index[rng.random(size) < NO_DESCRIPTION_RATE] = len(DESCRIPTIONS)
+
+        day_offsets = rng.choice(len(self.day_weights), size=size, p=self.day_weights)
+        expense_dates = np.datetime64(self.start, "D") + day_offsets
+        # Recorded within three days of the expense, modified within a month
+        created_at = expense_dates.astype("datetime64[us]") + rng.integers(
+            0, 3 * 86400 * 10**6, size
+        ).astype("timedelta64[us]")
+        modified_delay = rng.integers(0, 30 * 86400 * 10**6, size)
+        modified_delay[rng.random(size) >= MODIFIED_RATE] = 0
+        modified_at = created_at + modified_delay.astype("timedelta64[us]")
+
+        return [
+            amounts.tolist(),
+            descriptions[description_index].tolist(),
+            names[category_index].tolist(),
+            expense_dates.tolist(),
+            created_at.tolist(),
+            modified_at.tolist(),
+        ]
+
+    def _python_batch(self, size: int) -> List[list]:
+        rng = self.rng
+        category_index = rng.choices(
+            range(len(CATEGORIES)), weights=self.category_weights, k=size
+        )
+        day_offsets = rng.choices(
+            range(len(self.day_weights)), weights=self.day_weights, k=size
+        )
+        amounts, descriptions, categories = [], [], []
+        expense_dates, created, modified = [], [], []
+        for index, offset in zip(category_index, day_offsets):
+            name, mu = CATEGORIES[index]
+            if rng.random() < UNCATEGORIZED_RATE:
+                name, mu = None, 3.5
+            amount = rng.lognormvariate(mu, AMOUNT_SIGMA)
+            if rng.random() < TAIL_RATE:
+                amount *= rng.paretovariate(TAIL_ALPHA)
+            amounts.append(max(round(amount, 2), 0.01))
+            descriptions.append(
+                None if rng.random() < NO_DESCRIPTION_RATE else rng.choice(DESCRIPTIONS)
+            )
+            categories.append(name)
+            expense_date = self.start + timedelta(days=offset)
+            created_at = datetime.combine(expense_date, datetime.min.time()) + (
+                timedelta(microseconds=rng.randrange(3 * 86400 * 10**6))
+            )
+            modified_at = created_at
+            if rng.random() < MODIFIED_RATE:
+                modified_at += timedelta(microseconds=rng.randrange(30 * 86400 * 10**6))
+            expense_dates.append(expense_date)
+            created.append(created_at)
+            modified.append(modified_at)
+        return [amounts, descriptions, categories, expense_dates, created, modified]
+
+
+def generate(
+    rows: int,
+    seed: int,
+    start: date,
+    end: date,
+    batch_size: int = 50000,
+    rebuild_rollups: bool = True,
+    defer_indexes: bool = False,
+) -> Dict[str, Any]:
+    generator = ExpenseGenerator(seed, start, end)
+    prepare_schema()
+    engine = get_engine()
+    if defer_indexes:
+        # Building each index once at the end beats maintaining it per row
+        for index in Expense.__table__.indexes:
+            index.drop(engine, checkfirst=True)
+        with engine.begin() as connection:
+            expense_search_index.drop(connection)
+    db = get_sessionmaker()()
+    repository = ExpenseRepository(db)
+    inserted = 0
+    started = time.perf_counter()
+    try:
+        while inserted < rows:
+            batch = generator.batch(min(batch_size, rows - inserted))
+            result = repository.bulk_create(Expense, batch, chunk_size=batch_size)
+            if result["errors"]:
+                raise RuntimeError(f"Bulk insert failed: {result['errors'][0]}")
+            inserted += len(result["created"])
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"{inserted}/{rows} rows, {inserted / elapsed * 60:,.0f} rows/min"
+            )
+        if defer_indexes:
+            db.close()
+            ensure_indexes(engine, Base.metadata)
+            with engine.begin() as connection:
+                expense_search_index.install(connection)
+        load_seconds = time.perf_counter() - started
+        rollup_rows = stats_sketches = None
+        if rebuild_rollups:
+            rollup_rows = ExpenseRollupRepository(db).rebuild()
+            stats_sketches = ExpenseStatsRepository(db).rebuild()
+    finally:
+        db.close()
+    return {
+        "rows": inserted,
+        "seconds": round(load_seconds, 3),
+        "rows_per_minute": (
+            round(inserted / load_seconds * 60) if load_seconds else None
+        ),
+        "backend": "numpy" if np is not None else "python",
+        "rollup_rows": rollup_rows,
+        "stats_sketches": stats_sketches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2023, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 12, 31))
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument(
+        "--skip-rollups",
+        action="store_true",
+        help="don't rebuild expense_daily_rollups and expense_amount_buckets after loading",
+    )
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="drop the expenses indexes while loading and rebuild them afterwards",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    report = generate(
+        rows=args.rows,
+        seed=args.seed,
+        start=args.start,
+        end=args.end,
+        batch_size=args.batch_size,
+        rebuild_rollups=not args.skip_rollups,
+        defer_indexes=args.defer_indexes,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from db import Base
 from base.models import TimestampMixin
-from sqlalchemy import Column, String, Float, Date, Text
+from base.utils.search import SearchIndex
+from sqlalchemy import DDL, Column, String, Float, Date, Text, Integer, Index, event
 
 
 class Expense(Base, TimestampMixin):
@@ -10,3 +11,86 @@ class Expense(Base, TimestampMixin):
     description = Column(Text)
     category = Column(String)
     expense_date = Column(Date, nullable=False)
+
+    # One index per supported filter (see ExpenseFilters) and per sort field.
+    # Sort indexes end with id, the keyset pagination tiebreaker.
+    __table_args__ = (
+        Index("ix_expenses_amount", "amount"),
+        Index("ix_expenses_expense_date", "expense_date"),
+        # varchar_pattern_ops lets Postgres serve startswith (LIKE 'x%') from
+        # the index under any collation; it still serves eq.
+        Index(
+            "ix_expenses_category",
+            "category",
+            postgresql_ops={"category": "varchar_pattern_ops"},
+        ),
+        # SQLite's LIKE is case-insensitive, so only an index with the NOCASE
+        # collation can serve startswith there (as a range scan).
+        Index("ix_expenses_category_nocase", category.collate("NOCASE")).ddl_if(
+            dialect="sqlite"
+        ),
+        Index("ix_expenses_created_at_id", "created_at", "id"),
+        Index("ix_expenses_modified_at_id", "modified_at", "id"),
+        # Lets Postgres answer conditional GETs (the version of one id) with an
+        # index-only scan; SQLite always reads the row through the primary key.
+        Index(
+            "ix_expenses_id_modified_at",
+            "id",
+            postgresql_include=["modified_at"],
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# Text search over description and category (see POST /v1/expense/list "search")
+expense_search_index = SearchIndex(Expense.__table__, ("description", "category"))
+
+
+class ExpenseDailyRollup(Base):
+    """
+    Totals per (category, expense_date), maintained by ExpenseService on every
+    write so summary queries don't have to scan ``expenses``. A null category
+    is stored as "" because it is part of the primary key.
+    """
+
+    __tablename__ = "expense_daily_rollups"
+
+    category = Column(String, primary_key=True, default="")
+    expense_date = Column(Date, primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+
+class ExpenseAmountBucket(Base):
+    """
+    Quantile sketches of ``amount`` per (category, month): the count of
+    expenses in each logarithmic bucket (see base.utils.sketch). Sketches of
+    several months or categories merge by summing counts per bucket. A null
+    category is stored as "" because it is part of the primary key.
+    """
+
+    __tablename__ = "expense_amount_buckets"
+
+    category = Column(String, primary_key=True, default="")
+    month = Column(String(7), primary_key=True)  # YYYY-MM of expense_date
+    bucket = Column(Integer, primary_key=True)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+
+class ExpenseAmountBucketEpoch(Base):
+    """
+    A single row counting the rebuilds of expense_amount_buckets. Workers
+    buffer sketch deltas against the epoch they last saw and drop them if it
+    changed by the time they flush, since the rebuild counted those expenses.
+    """
+
+    __tablename__ = "expense_amount_bucket_epoch"
+
+    id = Column(Integer, primary_key=True)
+    epoch = Column(Integer, nullable=False, default=0)
+
+
+event.listen(
+    ExpenseAmountBucketEpoch.__table__,
+    "after_create",
+    DDL("INSERT INTO expense_amount_bucket_epoch (id, epoch) VALUES (1, 0)"),
+)
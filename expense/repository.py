@@ -1,11 +1,65 @@
-from base.repository import BaseRepository
-from expense.models import Expense
-from typing import Any, Dict, List, Optional
+import math
+import os
+from base.repository import BaseRepository, AsyncBaseRepository
+from base.utils.cache import LRUCache
+from base.utils.filters import filter_fields
+from base.utils.read_routing import replica_reads
+from base.utils.sketch import (
+    RELATIVE_ACCURACY,
+    QuantileSketch,
+    bucket_deltas,
+    bucket_of,
+)
+from collections import defaultdict
+from datetime import date
+from expense.models import (
+    Expense,
+    ExpenseAmountBucket,
+    ExpenseAmountBucketEpoch,
+    ExpenseDailyRollup,
+    expense_search_index,
+)
+from typing import Any, Dict, List, Optional, Tuple
 from db import get_db
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
+expense_cache = LRUCache(
+    max_size=int(os.getenv("EXPENSE_CACHE_MAX_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("EXPENSE_CACHE_TTL_SECONDS", "30")),
+)
+expense_count_cache = LRUCache(
+    max_size=int(os.getenv("EXPENSE_COUNT_CACHE_MAX_SIZE", "1000")),
+    ttl_seconds=float(os.getenv("EXPENSE_COUNT_CACHE_TTL_SECONDS", "5")),
+)
+expense_stats_cache = LRUCache(
+    max_size=int(os.getenv("EXPENSE_STATS_CACHE_MAX_SIZE", "256")),
+    ttl_seconds=float(os.getenv("EXPENSE_STATS_CACHE_TTL_SECONDS", "5")),
+)
+
+# Rows of one INSERT when writing a rebuilt table
+REBUILD_CHUNK_SIZE = 10000
+
+
+def _additive_upsert(db: Session, table, key_columns: List[str], value_columns):
+    """INSERT ... ON CONFLICT (keys) DO UPDATE adding the new values to the stored ones."""
+    dialect = db.get_bind().dialect.name
+    insert_fn = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+    if insert_fn is None:
+        raise NotImplementedError(f"Upsert not supported on {dialect}")
+    statement = insert_fn(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key_columns],
+        set_={name: table.c[name] + statement.excluded[name] for name in value_columns},
+    )
+
 
 class ExpenseRepository(BaseRepository):
+    cache = expense_cache
+    count_cache = expense_count_cache
+    search_index = expense_search_index
+
     def __init__(self, db: Session):
         super().__init__(db)
 
@@ -15,11 +69,21 @@ class ExpenseRepository(BaseRepository):
     def get_by_id(self, model, record_id):
         return super().get_by_id(model, record_id)
 
-    def update_by_id(self, model, record_id, fields_to_update):
-        return super().update_by_id(model, record_id, fields_to_update)
+    def update_by_id(
+        self, model, record_id, fields_to_update, snapshot_columns=None, on_batch=None
+    ):
+        return super().update_by_id(
+            model,
+            record_id,
+            fields_to_update,
+            snapshot_columns=snapshot_columns,
+            on_batch=on_batch,
+        )
 
-    def delete_by_id(self, model, record_id):
-        return super().delete_by_id(model, record_id)
+    def delete_by_id(self, model, record_id, snapshot_columns=None, on_batch=None):
+        return super().delete_by_id(
+            model, record_id, snapshot_columns=snapshot_columns, on_batch=on_batch
+        )
 
     def list(
         self,
@@ -30,6 +94,10 @@ class ExpenseRepository(BaseRepository):
         sort_by=None,
         skip=0,
         limit=100,
+        keyset=False,
+        cursor=None,
+        count="exact",
+        search=None,
     ):
         return super().list(
             model=model,
@@ -38,4 +106,393 @@ class ExpenseRepository(BaseRepository):
             sort_by=sort_by,
             skip=skip,
             limit=limit,
+            keyset=keyset,
+            cursor=cursor,
+            count=count,
+            search=search,
+        )
+
+    def _estimate_count(self, model, query, filters, search=None):
+        # The daily rollups keep a count per category and day; they can drift
+        # by a write until rebuilt, hence only an estimate.
+        filters = filters or {}
+        rollup_fields = ExpenseRollupRepository.ROLLUP_FILTER_FIELDS
+        if not search and filter_fields(filters) <= rollup_fields:
+            summary = ExpenseRollupRepository(self.db).summarize(filters, [])
+            return summary["groups"][0]["count"]
+        return super()._estimate_count(model, query, filters, search)
+
+
+class AsyncExpenseRepository(AsyncBaseRepository):
+    sync_repository_class = ExpenseRepository
+
+
+class ExpenseRollupRepository(BaseRepository):
+    """
+    Maintains ``expense_daily_rollups`` and answers summary queries.
+
+    Updates and deletes move their rollups inside the expense write's own
+    transaction, from the old row read under lock. Creates add theirs right
+    after the insert commits, so a crash in between can leave them off by that
+    write; ``rebuild`` recomputes them from the expenses table.
+    """
+
+    # Filters a rollup row can answer; anything else (e.g. amount) needs the
+    # expenses table.
+    ROLLUP_FILTER_FIELDS = {"category", "expense_date"}
+
+    def __init__(self, db: Session):
+        super().__init__(db)
+
+    @staticmethod
+    def deltas_for(
+        removed: List[Dict[str, Any]] = (), added: List[Dict[str, Any]] = ()
+    ) -> Dict[Tuple[str, date], List[float]]:
+        """Folds expense rows into [amount, count] deltas per rollup key."""
+        deltas = defaultdict(lambda: [0.0, 0])
+        for sign, rows in ((-1, removed), (1, added)):
+            for row in rows:
+                key = (row.get("category") or "", row["expense_date"])
+                deltas[key][0] += sign * row["amount"]
+                deltas[key][1] += sign
+        return {key: delta for key, delta in deltas.items() if delta != [0.0, 0]}
+
+    def apply_deltas(
+        self, deltas: Dict[Tuple[str, date], List[float]], commit: bool = True
+    ) -> None:
+        """
+        Adds ``deltas`` to the rollup rows. With ``commit=False`` they join the
+        caller's open transaction (e.g. the expense write they come from).
+        """
+        if not deltas:
+            return
+        table = ExpenseDailyRollup.__table__
+        statement = _additive_upsert(
+            self.db,
+            table,
+            ["category", "expense_date"],
+            ["total_amount", "expense_count"],
+        )
+        self.db.execute(
+            statement,
+            [
+                {
+                    "category": category,
+                    "expense_date": expense_date,
+                    "total_amount": amount,
+                    "expense_count": count,
+                }
+                for (category, expense_date), (amount, count) in deltas.items()
+            ],
+        )
+        self.db.execute(delete(table).where(table.c.expense_count <= 0))
+        if commit:
+            self.db.commit()
+
+    def rebuild(self) -> int:
+        table = ExpenseDailyRollup.__table__
+        self.db.execute(delete(table))
+        self.db.execute(
+            insert(table).from_select(
+                ["category", "expense_date", "total_amount", "expense_count"],
+                select(
+                    func.coalesce(Expense.category, ""),
+                    Expense.expense_date,
+                    func.sum(Expense.amount),
+                    func.count(Expense.id),
+                ).group_by(func.coalesce(Expense.category, ""), Expense.expense_date),
+            )
+        )
+        self.db.commit()
+        return self.db.scalar(select(func.count()).select_from(table))
+
+    def summarize(
+        self, filters: Dict[str, Dict[str, Any]], group_by: List[str]
+    ) -> Dict[str, Any]:
+        use_rollup = filter_fields(filters) <= self.ROLLUP_FILTER_FIELDS
+        if use_rollup:
+            model = ExpenseDailyRollup
+            total = func.sum(ExpenseDailyRollup.total_amount)
+            count = func.sum(ExpenseDailyRollup.expense_count)
+        else:
+            model = Expense
+            total = func.sum(Expense.amount)
+            count = func.count(Expense.id)
+
+        dimensions = {
+            "category": model.category,
+            "day": model.expense_date,
+            "month": self._month_expression(model.expense_date),
+        }
+        group_columns = [dimensions[name].label(name) for name in group_by]
+        statement = select(
+            *group_columns, total.label("total_amount"), count.label("count")
+        )
+        if filters:
+            statement = self._apply_filters(statement, filters, model)
+        if group_columns:
+            statement = statement.group_by(*group_columns).order_by(*group_columns)
+
+        groups = []
+        for row in self.db.execute(statement):
+            group = dict(row._mapping)
+            if "category" in group and not group["category"]:
+                group["category"] = None
+            group["total_amount"] = group["total_amount"] or 0.0
+            group["count"] = int(group["count"] or 0)
+            groups.append(group)
+        return {"groups": groups, "source": "rollup" if use_rollup else "expenses"}
+
+    def _month_expression(self, column):
+        if self.db.get_bind().dialect.name == "sqlite":
+            return func.strftime("%Y-%m", column)
+        return func.to_char(column, "YYYY-MM")
+
+
+class AsyncExpenseRollupRepository(AsyncBaseRepository):
+    sync_repository_class = ExpenseRollupRepository
+
+    deltas_for = staticmethod(ExpenseRollupRepository.deltas_for)
+
+    async def apply_deltas(self, deltas, commit: bool = True) -> None:
+        return await self._run("apply_deltas", deltas, commit)
+
+    async def rebuild(self) -> int:
+        return await self._run("rebuild")
+
+    async def summarize(
+        self, filters: Dict[str, Dict[str, Any]], group_by: List[str]
+    ) -> Dict[str, Any]:
+        return await self._run("summarize", filters, group_by)
+
+
+def _month(expense_date) -> str:
+    return str(expense_date)[:7]
+
+
+class ExpenseStatsRepository(BaseRepository):
+    """
+    Maintains the amount sketches in ``expense_amount_buckets`` and answers
+    percentile and histogram queries from them.
+
+    Services buffer bucket deltas in memory and write them in batches with
+    ``apply_deltas`` (see flush_expense_stats), so the sketches trail the
+    expenses by up to a flush interval, and lose what a worker buffered if it
+    dies; ``rebuild`` recomputes them from the expenses table.
+
+    Each rebuild bumps the epoch in expense_amount_bucket_epoch. Deltas
+    buffered under an older epoch are dropped rather than applied, so other
+    workers' buffers don't count the rebuilt expenses twice; writes made
+    between the rebuild and a worker's next flush are dropped with them.
+    """
+
+    cache = expense_stats_cache
+
+    def __init__(self, db: Session):
+        super().__init__(db)
+
+    @staticmethod
+    def deltas_for(
+        removed: List[Dict[str, Any]] = (), added: List[Dict[str, Any]] = ()
+    ) -> Dict[Tuple[Tuple[str, str], int], int]:
+        """Folds expense rows into count deltas per ((category, month), bucket)."""
+
+        def values(rows):
+            return [
+                (
+                    (row.get("category") or "", _month(row["expense_date"])),
+                    row["amount"],
+                )
+                for row in rows
+            ]
+
+        return bucket_deltas(removed=values(removed), added=values(added))
+
+    def current_epoch(self) -> int:
+        return self.db.scalar(select(ExpenseAmountBucketEpoch.epoch)) or 0
+
+    def _ensure_epoch_row(self) -> None:
+        # create_all inserts the row with the table; other setups get it here
+        if self.db.scalar(select(ExpenseAmountBucketEpoch.id)) is None:
+            self.db.execute(insert(ExpenseAmountBucketEpoch.__table__).values(id=1))
+
+    def apply_deltas(
+        self, deltas: Dict[Tuple[Tuple[str, str], int], int], epoch: int
+    ) -> int:
+        """
+        Adds ``deltas``, buffered while the sketches were at ``epoch``, unless
+        they have been rebuilt since. Returns the current epoch: when it
+        differs from ``epoch``, nothing was applied.
+        """
+        if not deltas:
+            return self.current_epoch()
+        self._ensure_epoch_row()
+        state = ExpenseAmountBucketEpoch.__table__
+        # A no-op write locks the epoch row, so no rebuild commits in between
+        same_epoch = self.db.execute(
+            update(state).where(state.c.epoch == epoch).values(epoch=state.c.epoch)
+        ).rowcount
+        if not same_epoch:
+            self.db.rollback()
+            return self.current_epoch()
+        table = ExpenseAmountBucket.__table__
+        rows = [
+            {
+                "category": category,
+                "month": month,
+                "bucket": bucket,
+                "expense_count": count,
+            }
+            for ((category, month), bucket), count in deltas.items()
+        ]
+        statement = _additive_upsert(
+            self.db, table, ["category", "month", "bucket"], ["expense_count"]
+        )
+        self.db.execute(statement, rows)
+        emptied = [row for row in rows if row["expense_count"] < 0]
+        if emptied:
+            self.db.execute(
+                delete(table).where(
+                    and_(
+                        table.c.category == bindparam("category"),
+                        table.c.month == bindparam("month"),
+                        table.c.bucket == bindparam("bucket"),
+                        table.c.expense_count <= 0,
+                    )
+                ),
+                [
+                    {key: row[key] for key in ("category", "month", "bucket")}
+                    for row in emptied
+                ],
+            )
+        self.db.commit()
+        self.cache.clear()
+        return epoch
+
+    def stats(
+        self,
+        *,
+        category: Optional[str] = None,
+        from_month: Optional[str] = None,
+        to_month: Optional[str] = None,
+        group_by: List[str],
+        quantiles: List[float],
+        histogram_edges: List[float],
+    ) -> Dict[str, Any]:
+        """
+        Count, bounds, ``quantiles`` and a histogram of amounts per ``group_by``
+        (category and/or month), merging the sketches of each group. Reads at
+        most one row per bucket of each stored sketch, however many expenses
+        there are; results are cached briefly.
+        """
+        key = repr((category, from_month, to_month, group_by, quantiles))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        table = ExpenseAmountBucket
+        dimensions = {"category": table.category, "month": table.month}
+        group_columns = [dimensions[name].label(name) for name in group_by]
+        statement = select(
+            *group_columns, table.bucket, func.sum(table.expense_count)
+        ).group_by(*group_columns, table.bucket)
+        if category is not None:
+            statement = statement.where(table.category == category)
+        if from_month is not None:
+            statement = statement.where(table.month >= from_month)
+        if to_month is not None:
+            statement = statement.where(table.month <= to_month)
+
+        sketches = defaultdict(QuantileSketch)
+        with replica_reads(self.db):
+            for *group, bucket, count in self.db.execute(statement):
+                sketches[tuple(group)].counts[bucket] = int(count)
+
+        groups = []
+        for group in sorted(sketches):
+            sketch = sketches[group]
+            if not sketch.count:
+                continue
+            values = dict(zip(group_by, group))
+            if "category" in values and not values["category"]:
+                values["category"] = None
+            low, high = sketch.bounds()
+            groups.append(
+                {
+                    **values,
+                    "count": sketch.count,
+                    "min": low,
+                    "max": high,
+                    "quantiles": [
+                        {"q": q, "value": value}
+                        for q, value in zip(quantiles, sketch.quantiles(quantiles))
+                    ],
+                    "histogram": [
+                        {
+                            "lower": lower if lower != -math.inf else None,
+                            "upper": upper if upper != math.inf else None,
+                            "count": count,
+                        }
+                        for lower, upper, count in sketch.histogram(histogram_edges)
+                    ],
+                }
+            )
+        result = {"groups": groups, "relative_accuracy": RELATIVE_ACCURACY}
+        self.cache.set(key, result)
+        return result
+
+    def rebuild(self) -> int:
+        """Recomputes every sketch from the expenses table; returns how many."""
+        self._ensure_epoch_row()
+        state = ExpenseAmountBucketEpoch.__table__
+        # First, so flushes in progress finish before the expenses are read and
+        # later ones see the new epoch
+        self.db.execute(update(state).values(epoch=state.c.epoch + 1))
+        counts = defaultdict(int)
+        rows = self.db.execute(
+            select(
+                Expense.category, Expense.expense_date, Expense.amount
+            ).execution_options(yield_per=REBUILD_CHUNK_SIZE)
         )
+        for category, expense_date, amount in rows:
+            counts[(category or "", _month(expense_date), bucket_of(amount))] += 1
+
+        table = ExpenseAmountBucket.__table__
+        self.db.execute(delete(table))
+        items = list(counts.items())
+        for start in range(0, len(items), REBUILD_CHUNK_SIZE):
+            self.db.execute(
+                insert(table),
+                [
+                    {
+                        "category": category,
+                        "month": month,
+                        "bucket": bucket,
+                        "expense_count": count,
+                    }
+                    for (category, month, bucket), count in items[
+                        start : start + REBUILD_CHUNK_SIZE
+                    ]
+                ],
+            )
+        self.db.commit()
+        self.cache.clear()
+        return len({(category, month) for category, month, _ in counts})
+
+
+class AsyncExpenseStatsRepository(AsyncBaseRepository):
+    sync_repository_class = ExpenseStatsRepository
+
+    deltas_for = staticmethod(ExpenseStatsRepository.deltas_for)
+
+    async def current_epoch(self) -> int:
+        return await self._run("current_epoch")
+
+    async def apply_deltas(self, deltas, epoch: int) -> int:
+        return await self._run("apply_deltas", deltas, epoch)
+
+    async def stats(self, **kwargs) -> Dict[str, Any]:
+        return await self._run("stats", **kwargs)
+
+    async def rebuild(self) -> int:
+        return await self._run("rebuild")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict, Any, Union
 from datetime import datetime, date
 
 from base.schemas.request import (
@@ -18,7 +18,10 @@ class ExpenseRecord(BaseModel):
     description: Optional[str] = Field(
         default=None, description="Description of the template"
     )
-    category: str = Field(description="Category of the expense")
+    category: Optional[str] = Field(default=None, description="Category of the expense")
+    expense_date: Optional[str] = Field(
+        default=None, description="Date the expense was incurred"
+    )
     created_at: Optional[str] = Field(
         default=None, description="Timestamp when the expense was created"
     )
@@ -27,6 +30,20 @@ class ExpenseRecord(BaseModel):
     )
 
 
+EXPENSE_RECORD_FIELDS = tuple(ExpenseRecord.model_fields)
+
+
+def validate_record_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in EXPENSE_RECORD_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields {unknown}; allowed: {list(EXPENSE_RECORD_FIELDS)}"
+        )
+    return list(dict.fromkeys(fields))
+
+
 class GetExpenseResponse(BaseModel):
     data: ExpenseRecord = Field(description="Details of the expense")
 
@@ -49,11 +66,42 @@ class CreateExpenseResponse(BaseModel):
     )
 
 
+class BulkCreateExpenseRequest(BaseModel):
+    # Items are validated one by one in the service so that a single bad row
+    # is reported in ``errors`` instead of rejecting the whole batch.
+    items: List[Dict[str, Any]] = Field(
+        min_length=1, max_length=10000, description="Expenses to create"
+    )
+
+
+class BulkCreatedExpense(BaseModel):
+    index: int = Field(description="Position of the item in the request")
+    id: str
+
+
+class BulkExpenseError(BaseModel):
+    index: int = Field(description="Position of the item in the request")
+    error: str
+
+
+class BulkCreateExpenseResponse(BaseModel):
+    message: str
+    created: List[BulkCreatedExpense]
+    errors: List[BulkExpenseError]
+
+
 class UpdateExpenseRequest(BaseModel):
-    amount: Optional[float]
-    description: Optional[str]
-    category: Optional[str]
-    expense_date: Optional[date]
+    # Omitted fields are left unchanged; an explicit null clears the field.
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    expense_date: Optional[date] = None
+
+    @field_validator("amount", "expense_date")
+    def not_null(cls, v, info):
+        if v is None:
+            raise ValueError(f"{info.field_name} cannot be null")
+        return v
 
 
 class UpdateExpenseResponse(BaseModel):
@@ -66,15 +114,94 @@ class DeleteExpenseResponse(BaseModel):
     message: str
 
 
-class CategoryFilterExpression(BaseModel):
-    op: Literal["eq", "startswith"]
-    value: str
+class CategoryFilterExpression(FilterExpression):
+    op: Literal["eq", "startswith", "in", "nin"]
+    value: Union[str, List[str]]
 
 
 class ExpenseFilters(BaseFilters):
     amount: Optional[FilterExpression] = None
     expense_date: Optional[DateRange] = None
     category: Optional[CategoryFilterExpression] = None
+    and_: Optional[List["ExpenseFilters"]] = Field(
+        default=None, alias="and", description="Groups that must all match"
+    )
+    or_: Optional[List["ExpenseFilters"]] = Field(
+        default=None, alias="or", description="Groups of which at least one matches"
+    )
+
+
+class BulkUpdateExpenseItem(BaseModel):
+    id: str
+    changes: UpdateExpenseRequest
+
+
+class BulkUpdateExpenseRequest(BaseModel):
+    """Either ``items`` (per-expense changes) or ``filters`` plus ``changes``."""
+
+    items: Optional[List[BulkUpdateExpenseItem]] = Field(
+        default=None, min_length=1, max_length=10000
+    )
+    filters: Optional[ExpenseFilters] = Field(default=None)
+    changes: Optional[UpdateExpenseRequest] = Field(
+        default=None, description="Changes applied to every expense matching filters"
+    )
+
+    @model_validator(mode="after")
+    def check_mode(self):
+        if self.items is not None:
+            if self.filters is not None or self.changes is not None:
+                raise ValueError("Pass either items or filters with changes, not both")
+            ids = [item.id for item in self.items]
+            if len(set(ids)) != len(ids):
+                raise ValueError("Each expense id may appear only once in items")
+            if any(not item.changes.model_fields_set for item in self.items):
+                raise ValueError("Every item must change at least one field")
+        else:
+            if self.filters is None or not self.filters.model_dump(exclude_none=True):
+                raise ValueError("filters must select expenses when items is omitted")
+            if self.changes is None or not self.changes.model_fields_set:
+                raise ValueError("changes must set at least one field")
+        return self
+
+
+class BulkUpdateExpenseResponse(BaseModel):
+    message: str
+    updated: int = Field(description="Number of expenses updated")
+    not_found: List[str] = Field(
+        default_factory=list, description="Requested ids that don't exist"
+    )
+
+
+class BulkDeleteExpenseRequest(BaseModel):
+    """Either ``ids`` or ``filters`` selecting the expenses to delete."""
+
+    ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=10000)
+    filters: Optional[ExpenseFilters] = Field(default=None)
+    dry_run: bool = Field(
+        default=False, description="Only count the expenses that would be deleted"
+    )
+
+    @model_validator(mode="after")
+    def check_mode(self):
+        if self.ids is not None and self.filters is not None:
+            raise ValueError("Pass either ids or filters, not both")
+        if self.ids is None and (
+            self.filters is None or not self.filters.model_dump(exclude_none=True)
+        ):
+            raise ValueError("ids or filters must select the expenses to delete")
+        return self
+
+
+class BulkDeleteExpenseResponse(BaseModel):
+    message: str
+    deleted: int = Field(
+        description="Number of expenses deleted (or that would be, on a dry run)"
+    )
+    dry_run: bool
+    not_found: List[str] = Field(
+        default_factory=list, description="Requested ids that don't exist"
+    )
 
 
 class ExpenseSortBy(SortBy):
@@ -90,8 +217,23 @@ class ExpenseSortBy(SortBy):
 
 class ListExpenseRequest(BaseModel):
     filters: Optional[ExpenseFilters] = Field(default=None)
+    search: Optional[str] = Field(
+        default=None,
+        min_length=1,
+        max_length=200,
+        description=(
+            "Words that description or category must all contain (whole words, "
+            "case-insensitive); offset pages list the best matches first"
+        ),
+    )
     sort_by: Optional[List[ExpenseSortBy]] = Field(default_factory=list)
     pagination: PaginationRequest = Field(default_factory=PaginationRequest)
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Only return these record fields (default: all)",
+    )
+
+    _validate_fields = field_validator("fields")(validate_record_fields)
 
     @model_validator(mode="before")
     def coerce_filters(cls, values):
@@ -107,5 +249,107 @@ class ListExpenseRequest(BaseModel):
         return values
 
 
+class ExportExpenseRequest(BaseModel):
+    filters: Optional[ExpenseFilters] = Field(default=None)
+    sort_by: Optional[List[ExpenseSortBy]] = Field(default_factory=list)
+    format: Literal["ndjson", "csv"] = Field(default="ndjson")
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Only export these record fields (default: all columns)",
+    )
+
+    _validate_fields = field_validator("fields")(validate_record_fields)
+
+
+class SummaryExpenseRequest(BaseModel):
+    filters: Optional[ExpenseFilters] = Field(default=None)
+    group_by: List[Literal["category", "day", "month"]] = Field(
+        default_factory=lambda: ["category"],
+        description="Dimensions to group by; day and month are of expense_date",
+    )
+
+    @field_validator("group_by")
+    def unique_group_by(cls, v):
+        return list(dict.fromkeys(v))
+
+
+class ExpenseSummaryGroup(BaseModel):
+    category: Optional[str] = None
+    day: Optional[date] = None
+    month: Optional[str] = Field(default=None, description="YYYY-MM")
+    total_amount: float
+    count: int
+
+
+class SummaryExpenseResponse(BaseModel):
+    groups: List[ExpenseSummaryGroup]
+    source: Literal["rollup", "expenses"] = Field(
+        description="Whether the rollup table or the expenses table was aggregated"
+    )
+
+
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+
+class ExpenseStatsRequest(BaseModel):
+    category: Optional[str] = Field(default=None, description="Only this category")
+    from_month: Optional[str] = Field(
+        default=None, pattern=MONTH_PATTERN, description="First month, YYYY-MM"
+    )
+    to_month: Optional[str] = Field(
+        default=None, pattern=MONTH_PATTERN, description="Last month, YYYY-MM"
+    )
+    group_by: List[Literal["category", "month"]] = Field(
+        default_factory=lambda: ["category", "month"],
+        description="Dimensions to group by; month is of expense_date",
+    )
+    quantiles: List[float] = Field(
+        default_factory=lambda: [0.5, 0.9, 0.99],
+        min_length=1,
+        max_length=20,
+        description="Quantiles of amount to report, each in [0, 1]",
+    )
+
+    @field_validator("group_by")
+    def unique_group_by(cls, v):
+        return list(dict.fromkeys(v))
+
+    @field_validator("quantiles")
+    def validate_quantiles(cls, v):
+        if any(not 0 <= q <= 1 for q in v):
+            raise ValueError("quantiles must be between 0 and 1")
+        return v
+
+
+class ExpenseAmountQuantile(BaseModel):
+    q: float
+    value: float
+
+
+class ExpenseAmountHistogramBin(BaseModel):
+    lower: Optional[float] = Field(description="Exclusive; null: unbounded")
+    upper: Optional[float] = Field(description="Inclusive; null: unbounded")
+    count: int
+
+
+class ExpenseStatsGroup(BaseModel):
+    category: Optional[str] = None
+    month: Optional[str] = Field(default=None, description="YYYY-MM")
+    count: int
+    min: float
+    max: float
+    quantiles: List[ExpenseAmountQuantile]
+    histogram: List[ExpenseAmountHistogramBin] = Field(
+        description="Non-empty amount bins"
+    )
+
+
+class ExpenseStatsResponse(BaseModel):
+    groups: List[ExpenseStatsGroup]
+    relative_accuracy: float = Field(
+        description="Reported amounts are within this relative error of the exact ones"
+    )
+
+
 class ListExpenseResponse(PaginatedResponse):
     data: List[ExpenseRecord]
@@ -1,21 +1,191 @@
 import logging
+import os
 from fastapi import HTTPException, status
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
 from expense.models import Expense
 from expense.schemas import (
     ExpenseRecord,
     CreateExpenseRequest,
+    BulkCreateExpenseRequest,
+    BulkCreateExpenseResponse,
     UpdateExpenseRequest,
+    BulkUpdateExpenseRequest,
+    BulkUpdateExpenseResponse,
+    BulkDeleteExpenseRequest,
+    BulkDeleteExpenseResponse,
     ListExpenseRequest,
     ListExpenseResponse,
+    ExportExpenseRequest,
+    SummaryExpenseRequest,
+    SummaryExpenseResponse,
+    ExpenseStatsRequest,
+    ExpenseStatsResponse,
 )
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from expense.repository import ExpenseRepository
-from base.service import BaseService
+from sqlalchemy.ext.asyncio import AsyncSession
+from expense.repository import (
+    ExpenseRepository,
+    AsyncExpenseRepository,
+    ExpenseRollupRepository,
+    AsyncExpenseRollupRepository,
+    ExpenseStatsRepository,
+    AsyncExpenseStatsRepository,
+)
+from base.service import BaseService, AsyncBaseService
+from base.utils.export import ndjson_chunks, csv_chunks
+from base.utils.read_routing import mark_request_wrote
+from base.utils.sketch import PendingBuckets
+from base.utils.write_coalescer import WRITE_COALESCE_ENABLED, WriteCoalescer
+from db import get_async_sessionmaker
 
 
 logger = logging.getLogger(__name__)
 
+ROLLUP_FIELDS = ("category", "expense_date", "amount")
+# How often buffered amount sketch changes are written (see flush_expense_stats)
+EXPENSE_STATS_FLUSH_SECONDS = float(os.getenv("EXPENSE_STATS_FLUSH_SECONDS", "5"))
+# Amount histogram bin edges: 1, 2, 5, 10, 20, 50, ... 1,000,000
+AMOUNT_HISTOGRAM_EDGES = [m * 10**e for e in range(6) for m in (1, 2, 5)] + [10**6]
+
+# Amount sketch changes of this worker's writes not yet in expense_amount_buckets
+expense_stats_pending = PendingBuckets()
+# Session.info key: sketch changes of the open transaction, buffered on commit
+STAGED_STATS = "expense_stats_staged"
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_committed_stats(session: Session) -> None:
+    staged = session.info.pop(STAGED_STATS, None)
+    if staged:
+        expense_stats_pending.add(staged.take())
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_stats(session: Session) -> None:
+    session.info.pop(STAGED_STATS, None)
+
+
+def _expense_columns(fields: Optional[List[str]]) -> Optional[List]:
+    return [getattr(Expense, field) for field in fields] if fields else None
+
+
+def _rollup_row(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: values.get(field) for field in ROLLUP_FIELDS}
+
+
+def _created_rollup_rows(
+    request: BulkCreateExpenseRequest, result: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    return [
+        _rollup_row(
+            CreateExpenseRequest.model_validate(
+                request.items[row["index"]]
+            ).model_dump()
+        )
+        for row in result["created"]
+    ]
+
+
+def _updated_rollup_row(
+    before: Dict[str, Any], request: UpdateExpenseRequest
+) -> Dict[str, Any]:
+    return _rollup_row({**before, **request.model_dump(exclude_unset=True)})
+
+
+def _changes_rollups(request: UpdateExpenseRequest) -> bool:
+    return not request.model_fields_set.isdisjoint(ROLLUP_FIELDS)
+
+
+def _bulk_update_snapshot(
+    request: BulkUpdateExpenseRequest,
+) -> Optional[List[str]]:
+    # Rows only need to be read before the update when rollups will move
+    changes = (
+        [item.changes for item in request.items] if request.items else [request.changes]
+    )
+    return list(ROLLUP_FIELDS) if any(map(_changes_rollups, changes)) else None
+
+
+class _RollupDeltas:
+    """
+    ``on_batch`` callback of the update and delete paths, called with the old
+    rows (read under lock) before each write commits: adds the rollup deltas
+    to the same transaction, so they commit, or fail, with the write. The
+    amount sketch deltas of the same rows are buffered once it commits. Runs
+    on the (sync) session the repository uses.
+    """
+
+    def __init__(self, db: Session, changes_for=None):
+        self.db = db
+        # Maps an expense id to its UpdateExpenseRequest; None for deletes
+        self.changes_for = changes_for
+
+    def __call__(self, rows: List[Dict[str, Any]]) -> None:
+        added = []
+        if self.changes_for is not None:
+            added = [
+                _updated_rollup_row(row, self.changes_for(row["id"])) for row in rows
+            ]
+        ExpenseRollupRepository(self.db).apply_deltas(
+            ExpenseRollupRepository.deltas_for(removed=rows, added=added),
+            commit=False,
+        )
+        self.db.info.setdefault(STAGED_STATS, PendingBuckets()).add(
+            ExpenseStatsRepository.deltas_for(removed=rows, added=added)
+        )
+
+
+def _bulk_update_rollups(
+    db: Session, request: BulkUpdateExpenseRequest
+) -> _RollupDeltas:
+    if request.items:
+        changes = {item.id: item.changes for item in request.items}
+        return _RollupDeltas(db, changes.__getitem__)
+    return _RollupDeltas(db, lambda _: request.changes)
+
+
+def _bulk_update_response(
+    request: BulkUpdateExpenseRequest, result: Dict[str, List]
+) -> BulkUpdateExpenseResponse:
+    updated = result["updated"]
+    if request.items:
+        message = f"{updated} of {len(request.items)} expenses updated"
+    else:
+        message = f"{updated} expenses updated"
+    return BulkUpdateExpenseResponse(
+        message=message, updated=updated, not_found=result["not_found"]
+    )
+
+
+def _bulk_delete_response(
+    request: BulkDeleteExpenseRequest, result: Dict[str, Any]
+) -> BulkDeleteExpenseResponse:
+    deleted = result["deleted"]
+    verb = "would be deleted" if request.dry_run else "deleted"
+    if request.ids:
+        message = f"{deleted} of {len(request.ids)} expenses {verb}"
+    else:
+        message = f"{deleted} expenses {verb}"
+    return BulkDeleteExpenseResponse(
+        message=message,
+        deleted=deleted,
+        dry_run=request.dry_run,
+        not_found=result["not_found"],
+    )
+
+
+def _flushed(deltas: Dict, epoch: int) -> int:
+    if epoch == expense_stats_pending.epoch:
+        return len(deltas)
+    # Rebuilt meanwhile: the rebuild counted these changes from the expenses
+    if deltas:
+        logger.info(
+            f"Dropped {len(deltas)} buffered amount sketch changes after a rebuild"
+        )
+    expense_stats_pending.epoch = epoch
+    return 0
+
 
 class ExpenseService(BaseService):
     def __init__(self, db: Session):
@@ -25,27 +195,115 @@ class ExpenseService(BaseService):
     def _get_repository(self) -> ExpenseRepository:
         return ExpenseRepository(self.db)
 
+    @property
+    def rollups(self) -> ExpenseRollupRepository:
+        return ExpenseRollupRepository(self.db)
+
+    @property
+    def stats(self) -> ExpenseStatsRepository:
+        return ExpenseStatsRepository(self.db)
+
+    def _update_rollups(self, removed=(), added=()) -> None:
+        self._apply_rollup_deltas(
+            ExpenseRollupRepository.deltas_for(removed=removed, added=added)
+        )
+        expense_stats_pending.add(
+            ExpenseStatsRepository.deltas_for(removed=removed, added=added)
+        )
+
+    def _apply_rollup_deltas(self, deltas) -> None:
+        # A failed rollup update must not fail the insert it follows; the rollup
+        # table can be recomputed with rebuild_summary_rollups.
+        try:
+            self.rollups.apply_deltas(deltas)
+        except Exception as e:
+            logger.error(f"Error updating expense rollups: {str(e)}")
+
     def create_expense(self, request: CreateExpenseRequest) -> str:
         id = self.create(model_class=Expense, pydantic_obj=request)
+        self._update_rollups(added=[_rollup_row(request.model_dump())])
         return id
 
+    def bulk_create_expense(
+        self, request: BulkCreateExpenseRequest
+    ) -> BulkCreateExpenseResponse:
+        result = self.bulk_create(
+            model_class=Expense,
+            request_model=CreateExpenseRequest,
+            items=request.items,
+        )
+        self._update_rollups(added=_created_rollup_rows(request, result))
+        return BulkCreateExpenseResponse(
+            message=f"{len(result['created'])} of {len(request.items)} expenses created",
+            created=result["created"],
+            errors=result["errors"],
+        )
+
+    def get_expense_version(self, expense_id: str):
+        return self.get_version(model_class=Expense, record_id=expense_id)
+
     def get_expense_by_id(self, expense_id: str) -> ExpenseRecord:
         expense = self.get_by_id(model_class=Expense, record_id=expense_id)
         if not expense:
             logger.error(f"Expense with ID {expense_id} not found.")
             raise ValueError(f"Expense with ID {expense_id} not found.")
-        return ExpenseRecord(**expense)
+        return ExpenseRecord.model_construct(**expense)
 
     def update_expense(
         self, expense_id: str, request: UpdateExpenseRequest
     ) -> Dict[str, str]:
-        updated_record = self.update_by_id(
-            model_class=Expense, record_id=expense_id, fields_to_update=request
+        snapshot_columns = list(ROLLUP_FIELDS) if _changes_rollups(request) else None
+        return self.update_by_id(
+            model_class=Expense,
+            record_id=expense_id,
+            fields_to_update=request,
+            snapshot_columns=snapshot_columns,
+            on_batch=_RollupDeltas(self.db, lambda _: request),
+        )
+
+    def bulk_update_expense(
+        self, request: BulkUpdateExpenseRequest
+    ) -> BulkUpdateExpenseResponse:
+        snapshot_columns = _bulk_update_snapshot(request)
+        rollups = _bulk_update_rollups(self.db, request)
+        if request.items:
+            result = self.bulk_update(
+                model_class=Expense,
+                changes=[(item.id, item.changes) for item in request.items],
+                snapshot_columns=snapshot_columns,
+                on_batch=rollups,
+            )
+        else:
+            result = self.bulk_update_by_filters(
+                model_class=Expense,
+                filters=request.filters,
+                fields_to_update=request.changes,
+                snapshot_columns=snapshot_columns,
+                on_batch=rollups,
+            )
+        return _bulk_update_response(request, result)
+
+    def bulk_delete_expense(
+        self, request: BulkDeleteExpenseRequest
+    ) -> BulkDeleteExpenseResponse:
+        rollups = _RollupDeltas(self.db)
+        result = self.bulk_delete(
+            model_class=Expense,
+            ids=request.ids,
+            filters=request.filters,
+            dry_run=request.dry_run,
+            snapshot_columns=list(ROLLUP_FIELDS),
+            on_batch=rollups,
         )
-        return updated_record
+        return _bulk_delete_response(request, result)
 
     def delete_expense_by_id(self, expense_id: str) -> ExpenseRecord:
-        expense = self.delete_by_id(model_class=Expense, record_id=expense_id)
+        expense = self.delete_by_id(
+            model_class=Expense,
+            record_id=expense_id,
+            snapshot_columns=list(ROLLUP_FIELDS),
+            on_batch=_RollupDeltas(self.db),
+        )
         if not expense:
             logger.error(f"Expense with ID {expense_id} not found.")
             raise ValueError(f"Expense with ID {expense_id} not found.")
@@ -58,6 +316,8 @@ class ExpenseService(BaseService):
                 pagination=request.pagination,
                 sort_by=request.sort_by,
                 filters=request.filters,
+                columns=_expense_columns(request.fields),
+                search=request.search,
             )
             return ListExpenseResponse.from_repository_result(
                 repo_result=repo_result,
@@ -65,6 +325,307 @@ class ExpenseService(BaseService):
                 limit=request.pagination.limit,
                 record_model=ExpenseRecord,
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error in list_expenses: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal server error")
+
+    def explain_list_expense(self, request: ListExpenseRequest) -> Dict[str, Any]:
+        return self.explain_list(
+            model_class=Expense,
+            pagination=request.pagination,
+            sort_by=request.sort_by,
+            filters=request.filters,
+            columns=_expense_columns(request.fields),
+            search=request.search,
+        )
+
+    def summarize_expense(
+        self, request: SummaryExpenseRequest
+    ) -> SummaryExpenseResponse:
+        try:
+            result = self.rollups.summarize(
+                self._process_filters(Expense, request.filters), request.group_by
+            )
+            return SummaryExpenseResponse(**result)
+        except Exception as e:
+            logger.error(f"Error in summarize_expense: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    def rebuild_summary_rollups(self) -> int:
+        return self.rollups.rebuild()
+
+    def expense_stats(self, request: ExpenseStatsRequest) -> ExpenseStatsResponse:
+        try:
+            result = self.stats.stats(
+                **request.model_dump(), histogram_edges=AMOUNT_HISTOGRAM_EDGES
+            )
+            return ExpenseStatsResponse(**result)
+        except Exception as e:
+            logger.error(f"Error in expense_stats: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    def flush_expense_stats(self) -> int:
+        """
+        Writes the buffered amount sketch changes; returns how many buckets
+        moved. On failure they stay buffered for the next flush. Runs even
+        with nothing buffered, to keep up with the epoch of the sketches.
+        """
+        pending = expense_stats_pending
+        if pending.epoch is None:
+            pending.epoch = self.stats.current_epoch()
+        deltas = pending.take()
+        try:
+            epoch = self.stats.apply_deltas(deltas, pending.epoch)
+        except Exception:
+            pending.restore(deltas)
+            raise
+        return _flushed(deltas, epoch)
+
+    def rebuild_expense_stats(self) -> int:
+        return self.stats.rebuild()
+
+
+class AsyncExpenseService(AsyncBaseService):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+        self.repository = self._get_repository()
+
+    def _get_repository(self) -> AsyncExpenseRepository:
+        return AsyncExpenseRepository(self.db)
+
+    @property
+    def rollups(self) -> AsyncExpenseRollupRepository:
+        return AsyncExpenseRollupRepository(self.db)
+
+    @property
+    def stats(self) -> AsyncExpenseStatsRepository:
+        return AsyncExpenseStatsRepository(self.db)
+
+    async def _update_rollups(self, removed=(), added=()) -> None:
+        await self._apply_rollup_deltas(
+            ExpenseRollupRepository.deltas_for(removed=removed, added=added)
+        )
+        expense_stats_pending.add(
+            ExpenseStatsRepository.deltas_for(removed=removed, added=added)
+        )
+
+    async def _apply_rollup_deltas(self, deltas) -> None:
+        try:
+            await self.rollups.apply_deltas(deltas)
+        except Exception as e:
+            logger.error(f"Error updating expense rollups: {str(e)}")
+
+    async def create_expense(self, request: CreateExpenseRequest) -> str:
+        if expense_create_coalescer is not None:
+            return await self._create_coalesced(request)
+        id = await self.create(model_class=Expense, pydantic_obj=request)
+        await self._update_rollups(added=[_rollup_row(request.model_dump())])
+        return id
+
+    async def _create_coalesced(self, request: CreateExpenseRequest) -> str:
+        try:
+            id = await expense_create_coalescer.submit(request.model_dump())
+        except Exception as e:
+            logger.error(f"Error in {self.__class__.__name__}.create: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error",
+            )
+        mark_request_wrote()
+        return id
+
+    async def bulk_create_expense(
+        self, request: BulkCreateExpenseRequest
+    ) -> BulkCreateExpenseResponse:
+        result = await self.bulk_create(
+            model_class=Expense,
+            request_model=CreateExpenseRequest,
+            items=request.items,
+        )
+        await self._update_rollups(added=_created_rollup_rows(request, result))
+        return BulkCreateExpenseResponse(
+            message=f"{len(result['created'])} of {len(request.items)} expenses created",
+            created=result["created"],
+            errors=result["errors"],
+        )
+
+    async def get_expense_version(self, expense_id: str):
+        return await self.get_version(model_class=Expense, record_id=expense_id)
+
+    async def get_expense_by_id(self, expense_id: str) -> ExpenseRecord:
+        expense = await self.get_by_id(model_class=Expense, record_id=expense_id)
+        if not expense:
+            logger.error(f"Expense with ID {expense_id} not found.")
+            raise ValueError(f"Expense with ID {expense_id} not found.")
+        return ExpenseRecord.model_construct(**expense)
+
+    async def update_expense(
+        self, expense_id: str, request: UpdateExpenseRequest
+    ) -> Dict[str, str]:
+        snapshot_columns = list(ROLLUP_FIELDS) if _changes_rollups(request) else None
+        return await self.update_by_id(
+            model_class=Expense,
+            record_id=expense_id,
+            fields_to_update=request,
+            snapshot_columns=snapshot_columns,
+            on_batch=_RollupDeltas(self.db.sync_session, lambda _: request),
+        )
+
+    async def bulk_update_expense(
+        self, request: BulkUpdateExpenseRequest
+    ) -> BulkUpdateExpenseResponse:
+        snapshot_columns = _bulk_update_snapshot(request)
+        rollups = _bulk_update_rollups(self.db.sync_session, request)
+        if request.items:
+            result = await self.bulk_update(
+                model_class=Expense,
+                changes=[(item.id, item.changes) for item in request.items],
+                snapshot_columns=snapshot_columns,
+                on_batch=rollups,
+            )
+        else:
+            result = await self.bulk_update_by_filters(
+                model_class=Expense,
+                filters=request.filters,
+                fields_to_update=request.changes,
+                snapshot_columns=snapshot_columns,
+                on_batch=rollups,
+            )
+        return _bulk_update_response(request, result)
+
+    async def bulk_delete_expense(
+        self, request: BulkDeleteExpenseRequest
+    ) -> BulkDeleteExpenseResponse:
+        rollups = _RollupDeltas(self.db.sync_session)
+        result = await self.bulk_delete(
+            model_class=Expense,
+            ids=request.ids,
+            filters=request.filters,
+            dry_run=request.dry_run,
+            snapshot_columns=list(ROLLUP_FIELDS),
+            on_batch=rollups,
+        )
+        return _bulk_delete_response(request, result)
+
+    async def delete_expense_by_id(self, expense_id: str) -> str:
+        expense = await self.delete_by_id(
+            model_class=Expense,
+            record_id=expense_id,
+            snapshot_columns=list(ROLLUP_FIELDS),
+            on_batch=_RollupDeltas(self.db.sync_session),
+        )
+        if not expense:
+            logger.error(f"Expense with ID {expense_id} not found.")
+            raise ValueError(f"Expense with ID {expense_id} not found.")
+        return f"Expense with ID {expense_id} deleted successfully"
+
+    async def list_expense(self, request: ListExpenseRequest) -> ListExpenseResponse:
+        try:
+            repo_result = await self.list(
+                model_class=Expense,
+                pagination=request.pagination,
+                sort_by=request.sort_by,
+                filters=request.filters,
+                columns=_expense_columns(request.fields),
+                search=request.search,
+            )
+            return ListExpenseResponse.from_repository_result(
+                repo_result=repo_result,
+                page=request.pagination.page,
+                limit=request.pagination.limit,
+                record_model=ExpenseRecord,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error in list_expenses: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    async def summarize_expense(
+        self, request: SummaryExpenseRequest
+    ) -> SummaryExpenseResponse:
+        try:
+            result = await self.rollups.summarize(
+                self._process_filters(Expense, request.filters), request.group_by
+            )
+            return SummaryExpenseResponse(**result)
+        except Exception as e:
+            logger.error(f"Error in summarize_expense: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    async def rebuild_summary_rollups(self) -> int:
+        return await self.rollups.rebuild()
+
+    async def expense_stats(self, request: ExpenseStatsRequest) -> ExpenseStatsResponse:
+        try:
+            result = await self.stats.stats(
+                **request.model_dump(), histogram_edges=AMOUNT_HISTOGRAM_EDGES
+            )
+            return ExpenseStatsResponse(**result)
+        except Exception as e:
+            logger.error(f"Error in expense_stats: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    async def flush_expense_stats(self) -> int:
+        pending = expense_stats_pending
+        if pending.epoch is None:
+            pending.epoch = await self.stats.current_epoch()
+        deltas = pending.take()
+        try:
+            epoch = await self.stats.apply_deltas(deltas, pending.epoch)
+        except Exception:
+            pending.restore(deltas)
+            raise
+        return _flushed(deltas, epoch)
+
+    async def rebuild_expense_stats(self) -> int:
+        return await self.stats.rebuild()
+
+    def export_expense(self, request: ExportExpenseRequest) -> AsyncIterator[str]:
+        rows = self.stream(
+            model_class=Expense,
+            sort_by=request.sort_by,
+            filters=request.filters,
+            columns=_expense_columns(request.fields),
+        )
+        if request.format == "csv":
+            fieldnames = request.fields or [
+                column.name for column in Expense.__table__.columns
+            ]
+            return csv_chunks(rows, fieldnames)
+        return ndjson_chunks(rows)
+
+
+async def _create_expense_batch(rows: List[Dict[str, Any]]) -> List[Any]:
+    """Inserts coalesced single creates in one transaction; an id or error per row."""
+    async with get_async_sessionmaker()() as db:
+        service = AsyncExpenseService(db)
+        result = await service.repository.bulk_create(
+            Expense, rows, chunk_size=len(rows)
+        )
+        await service._update_rollups(
+            added=[_rollup_row(rows[row["index"]]) for row in result["created"]]
+        )
+    outcomes = [None] * len(rows)
+    for row in result["created"]:
+        outcomes[row["index"]] = row["id"]
+    for error in result["errors"]:
+        outcomes[error["index"]] = RuntimeError(error["error"])
+    return outcomes
+
+
+async def flush_expense_stats() -> int:
+    """Writes this worker's buffered amount sketch changes in a session of its own."""
+    async with get_async_sessionmaker()() as db:
+        return await AsyncExpenseService(db).flush_expense_stats()
+
+
+# Opt-in (WRITE_COALESCE_ENABLED): concurrent POST /v1/expense/ requests share
+# one insert transaction instead of committing one by one.
+expense_create_coalescer = (
+    WriteCoalescer("expense_create", _create_expense_batch)
+    if WRITE_COALESCE_ENABLED
+    else None
+)
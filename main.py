@@ -1,18 +1,165 @@
+from time import perf_counter
+
+_import_started = perf_counter()
+
+import asyncio
 import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.orm import configure_mappers
+from starlette.concurrency import run_in_threadpool
 from expense.api import router as expense_router
+from db import (
+    REPLICA_URLS,
+    Base,
+    async_pool_stats,
+    check_replicas,
+    dispose_engines,
+    ping,
+    pool_stats,
+    prepare_schema,
+    replica_health,
+    warm_async_pool,
+)
+from expense.repository import expense_cache, expense_count_cache, expense_stats_cache
+from expense.service import (
+    EXPENSE_STATS_FLUSH_SECONDS,
+    expense_create_coalescer,
+    flush_expense_stats,
+)
+from base.utils.instrumentation import RequestMetricsMiddleware
+from base.utils.metrics import REGISTRY
+from base.utils.read_routing import ReadYourWritesMiddleware
+from base.utils.serializer import model_serializer
+from base.utils.snowflake import get_snowflake_generator
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
 logger = logging.getLogger(__name__)
 
+# Connections opened per worker before it reports ready
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", os.getenv("DB_POOL_SIZE", "5")))
+# How long startup waits for warm-up before serving anyway (readiness stays
+# 503 until warm-up succeeds; failed attempts are retried in the background)
+STARTUP_WAIT_SECONDS = float(os.getenv("STARTUP_WAIT_SECONDS", "10"))
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+REPLICA_HEALTH_INTERVAL_SECONDS = float(
+    os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "10")
+)
+# After a client's own write, its reads go to the primary for this long (0: off)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "0"))
+
+
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.error = None
+        self.import_seconds = None
+        self.warm_up_seconds = None
+
+
+startup_state = StartupState()
+
+
+async def warm_up(app: FastAPI) -> None:
+    """Everything a worker does once before serving, so first requests don't pay for it."""
+    await run_in_threadpool(prepare_schema)
+    configure_mappers()
+    for mapper in Base.registry.mappers:
+        model_serializer(mapper.class_)
+    # Claims the snowflake worker slot (a DB/file lease) up front
+    await run_in_threadpool(get_snowflake_generator)
+    app.openapi()
+    await warm_async_pool(DB_POOL_WARMUP)
+
+
+async def warm_up_until_ready(app: FastAPI) -> None:
+    started = perf_counter()
+    while True:
+        startup_state.attempts += 1
+        try:
+            await warm_up(app)
+        except Exception as e:
+            startup_state.error = str(e)
+            logger.error(
+                f"Startup warm-up failed (attempt {startup_state.attempts}), "
+                f"retrying in {STARTUP_RETRY_SECONDS}s: {str(e)}"
+            )
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+            continue
+        startup_state.warm_up_seconds = perf_counter() - started
+        startup_state.error = None
+        startup_state.ready = True
+        logger.info(
+            f"Ready: imports took {startup_state.import_seconds * 1000:.0f} ms, "
+            f"warm-up {startup_state.warm_up_seconds * 1000:.0f} ms"
+        )
+        return
+
+
+async def check_replicas_periodically() -> None:
+    while True:
+        try:
+            await check_replicas(READINESS_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.error(f"Error checking read replicas: {str(e)}")
+        await asyncio.sleep(REPLICA_HEALTH_INTERVAL_SECONDS)
+
+
+async def flush_expense_stats_periodically(warm_up_task: asyncio.Task) -> None:
+    # Nothing can be flushed before the database answers. The first flush, right
+    # after warm-up, learns the epoch of the stored sketches that the changes
+    # buffered so far are counted against.
+    await warm_up_task
+    while True:
+        try:
+            await flush_expense_stats()
+        except Exception as e:
+            logger.error(f"Error flushing expense stats: {str(e)}")
+        await asyncio.sleep(EXPENSE_STATS_FLUSH_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(warm_up_until_ready(app))]
+    if REPLICA_URLS:
+        tasks.append(asyncio.create_task(check_replicas_periodically()))
+    tasks.append(asyncio.create_task(flush_expense_stats_periodically(tasks[0])))
+    # Usually ready before the first request; an unreachable database only
+    # delays readiness, liveness is served regardless.
+    await asyncio.wait({tasks[0]}, timeout=STARTUP_WAIT_SECONDS)
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        if expense_create_coalescer is not None:
+            await expense_create_coalescer.drain()
+        try:
+            await flush_expense_stats()
+        except Exception as e:
+            logger.error(f"Error flushing expense stats: {str(e)}")
+        await dispose_engines()
+
+
 app = FastAPI(
     title="Expense Tracker API",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI
     redoc_url="/redoc",  # ReDoc UI
-    openapi_url="/openapi.json",  # OpenAPI schema
+    openapi_url="/openapi.json",  # OpenAPI schema, generated once during warm-up
+    lifespan=lifespan,
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+app.add_middleware(ReadYourWritesMiddleware, window_seconds=READ_YOUR_WRITES_SECONDS)
+
 # Include expense router
 app.include_router(expense_router, prefix="/v1", tags=["Expense"])
 
@@ -28,11 +175,57 @@ def health_check():
     return {"status": "Healthy"}
 
 
-# Cache OpenAPI schema generation to avoid recomputation
-@app.get("/openapi.json", include_in_schema=False)
-async def custom_openapi():
-    return get_openapi(
-        title=app.title,
-        version=app.version,
-        routes=app.routes,
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    details = {
+        "attempts": startup_state.attempts,
+        "import_seconds": startup_state.import_seconds,
+        "warm_up_seconds": startup_state.warm_up_seconds,
+    }
+    if not startup_state.ready:
+        return JSONResponse(
+            {"status": "starting", "error": startup_state.error, **details},
+            status_code=503,
+        )
+    try:
+        await asyncio.wait_for(ping(), READINESS_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {str(e)}")
+        return JSONResponse(
+            {"status": "unavailable", "error": str(e), **details}, status_code=503
+        )
+    return {"status": "ready", **details}
+
+
+@app.get("/health/db-pool")
+def db_pool_stats():
+    return {"sync": pool_stats.snapshot(), "async": async_pool_stats.snapshot()}
+
+
+@app.get("/health/replicas")
+def replicas():
+    return replica_health()
+
+
+@app.get("/health/cache")
+def cache_stats():
+    return {
+        "expense": expense_cache.stats(),
+        "expense_counts": expense_count_cache.stats(),
+        "expense_stats": expense_stats_cache.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
     )
+
+
+startup_state.import_seconds = perf_counter() - _import_started